@@ -0,0 +1,292 @@
+import struct
+from multiprocessing import resource_tracker, shared_memory
+from gameboard import BoardClass
+from players import Player, GameDriver
+from pools import BOARD_POOL
+from ultimate import UltimateBoardClass
+
+# The segment starts with the magic bytes, the layout version and the number of slots
+SEGMENT_HEADER = struct.Struct('<4sHI')
+MAGIC = b'TTTC'
+VERSION = 2
+
+# A checkpoint of one game. The sequence number is written last, and 0 means the copy is invalid.
+# sequence, variant, x_mask, o_mask, moves, first move, last player, result,
+# wins, ties, losses, forfeits, x_cells, o_cells, drawn_mask, forced,
+# token, player name, other player name. The cells, drawn_mask and forced
+# are only used by ultimate boards.
+CHECKPOINT = struct.Struct('<IBHHHcBB4I16s16sHb16s64s64s')
+
+# Every slot holds two copies of its checkpoint, so a crash in the middle
+# of writing one copy always leaves the other one intact
+SLOT_SIZE = 2 * CHECKPOINT.size
+
+RESULTS = ('', 'You have won', 'You have lost', 'Tie')
+
+# The board class of every variant
+CLASSIC = 0
+ULTIMATE = 1
+
+
+def _fitName(name: str) -> bytes:
+    """Encodes a name, cut to the 64 bytes a checkpoint holds without splitting a character"""
+    return name.encode('utf-8')[:64].decode('utf-8', 'ignore').encode('utf-8')
+
+
+class CheckpointStore:
+    """Fixed size checkpoints of live games in shared memory
+
+    Every game gets a slot, and the game is saved into its slot after every
+    move. The memory outlives the process that writes it, so a supervisor
+    that restarts a crashed worker can attach to the segment by name and
+    load every live game straight from memory. The supervisor should create
+    the segment and the workers attach to it, so it survives their crashes.
+
+    Attributes:
+        memory: the shared memory segment
+        slot_count: the number of slots in the segment
+        free_slots: the slots not holding a game, kept by this process only
+
+    """
+    def __init__(self, name: str | None = None, slot_count: int = 1024, create: bool = True, track: bool = True) -> None:
+        """Creates a new segment or attaches to an existing one
+
+        Args:
+            name: the name of the segment, a random one if None and creating
+            slot_count: the number of slots, only used when creating
+            create: whether to create the segment or attach to an existing one
+            track: whether an attached segment stays registered with the resource tracker
+
+        """
+        if create:
+            self.memory = shared_memory.SharedMemory(name, True, SEGMENT_HEADER.size + slot_count * SLOT_SIZE)
+            self.memory.buf[:len(self.memory.buf)] = bytes(len(self.memory.buf))
+            SEGMENT_HEADER.pack_into(self.memory.buf, 0, MAGIC, VERSION, slot_count)
+            self.slot_count = slot_count
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+            if not track:
+                # Attaching registers the segment with the resource tracker as well,
+                # which would destroy it when a worker with its own tracker exits
+                resource_tracker.unregister(self.memory._name, 'shared_memory')
+            magic, version, self.slot_count = SEGMENT_HEADER.unpack_from(self.memory.buf, 0)
+            if magic != MAGIC or version != VERSION:
+                self.memory.close()
+                raise ValueError("{0} is not a checkpoint segment".format(name))
+
+        live = set(self.liveSlots())
+        self.free_slots = [slot for slot in reversed(range(self.slot_count)) if slot not in live]
+
+    @classmethod
+    def attach(cls, name: str, track: bool = True) -> 'CheckpointStore':
+        """Attaches to an existing segment
+
+        Workers started by the supervisor with multiprocessing share its
+        resource tracker and keep track on. Workers started any other way
+        have their own tracker and must turn it off, or the segment is
+        destroyed when they exit.
+
+        Args:
+            name: the name of the segment
+            track: whether the segment stays registered with the resource tracker
+
+        Returns:
+            The store
+        """
+        return cls(name, create=False, track=track)
+
+    def getName(self) -> str:
+        """Returns the name of the segment"""
+        return self.memory.name
+
+    def _copyOffset(self, slot: int, copy: int) -> int:
+        """Returns where a copy of a slot starts in the segment"""
+        if not 0 <= slot < self.slot_count:
+            raise IndexError("No slot {0}".format(slot))
+        return SEGMENT_HEADER.size + slot * SLOT_SIZE + copy * CHECKPOINT.size
+
+    def _sequences(self, slot: int) -> tuple[int, int]:
+        """Returns the sequence numbers of both copies of a slot"""
+        return (struct.unpack_from('<I', self.memory.buf, self._copyOffset(slot, 0))[0],
+                struct.unpack_from('<I', self.memory.buf, self._copyOffset(slot, 1))[0])
+
+    def allocate(self) -> int:
+        """Get a free slot for a new game
+
+        Returns:
+            The slot
+        """
+        if not self.free_slots:
+            raise MemoryError("All {0} checkpoint slots are in use".format(self.slot_count))
+        return self.free_slots.pop()
+
+    def free(self, slot: int) -> None:
+        """Forgets the game in a slot, e.g. when it is over
+
+        Args:
+            slot: the slot
+
+        """
+        for copy in range(2):
+            struct.pack_into('<I', self.memory.buf, self._copyOffset(slot, copy), 0)
+        self.free_slots.append(slot)
+
+    def save(self, slot: int, board: BoardClass, moves: int, first_move: str, token: bytes) -> None:
+        """Saves a game into its slot
+
+        The older copy is overwritten with its sequence number set to 0, and
+        the new sequence number is only written once everything else is.
+        Names longer than 64 bytes are cut at a character boundary to fit,
+        so a game with long names is still saved.
+
+        Args:
+            slot: the slot of the game
+            board: the board of the game
+            moves: the number of moves made
+            first_move: the move of the player that moved first, either 'x' or 'o'
+            token: the session token of the game, at most 16 bytes and not ending in zero bytes
+
+        """
+        if len(token) > 16:
+            raise ValueError("The token doesn't fit in a checkpoint")
+        player_name = _fitName(board.getPlayerName())
+        other_player_name = _fitName(board.getOtherPlayerName())
+
+        if board.name_of_last_player == '':
+            last_player = 0
+        elif board.name_of_last_player == board.getPlayerName():
+            last_player = 1
+        else:
+            last_player = 2
+
+        if isinstance(board, UltimateBoardClass):
+            cells = (ULTIMATE, board.x_cells.to_bytes(16, 'little'), board.o_cells.to_bytes(16, 'little'),
+                     board.drawn_mask, board.forced)
+        else:
+            cells = (CLASSIC, b'', b'', 0, -1)
+
+        sequences = self._sequences(slot)
+        copy = 0 if sequences[0] <= sequences[1] else 1
+        offset = self._copyOffset(slot, copy)
+        CHECKPOINT.pack_into(self.memory.buf, offset, 0, cells[0],
+                             board.x_mask, board.o_mask, moves, first_move.encode('ascii'), last_player,
+                             RESULTS.index(board.getResult()),
+                             board.number_of_win, board.number_of_ties, board.number_of_losses, board.number_of_forfeits,
+                             cells[1], cells[2], cells[3], cells[4],
+                             token, player_name, other_player_name)
+        struct.pack_into('<I', self.memory.buf, offset, max(sequences) + 1)
+
+    def load(self, slot: int) -> (tuple[BoardClass, int, str, bytes] | None):
+        """Loads the game in a slot
+
+        Args:
+            slot: the slot
+
+        Returns:
+            The board, the number of moves, the move of the player that moved
+            first and the session token, or None if the slot is free
+        """
+        sequences = self._sequences(slot)
+        if max(sequences) == 0:
+            return None
+        copy = 0 if sequences[0] > sequences[1] else 1
+
+        (_, variant, x_mask, o_mask, moves, first_move, last_player, result,
+         wins, ties, losses, forfeits, x_cells, o_cells, drawn_mask, forced,
+         token, player_name, other_player_name) = \
+            CHECKPOINT.unpack_from(self.memory.buf, self._copyOffset(slot, copy))
+
+        if variant == ULTIMATE:
+            board = UltimateBoardClass()
+            board.x_cells = int.from_bytes(x_cells, 'little')
+            board.o_cells = int.from_bytes(o_cells, 'little')
+            board.drawn_mask = drawn_mask
+            board.forced = forced
+        else:
+            board = BOARD_POOL.acquire()
+        board.setPlayerName(player_name.rstrip(b'\x00').decode('utf-8'))
+        board.setOtherPlayerName(other_player_name.rstrip(b'\x00').decode('utf-8'))
+        board.name_of_last_player = ('', board.getPlayerName(), board.getOtherPlayerName())[last_player]
+        board.x_mask = x_mask
+        board.o_mask = o_mask
+        board.result = RESULTS[result]
+        board.number_of_win = wins
+        board.number_of_ties = ties
+        board.number_of_losses = losses
+        board.number_of_forfeits = forfeits
+        return (board, moves, first_move.decode('ascii'), token.rstrip(b'\x00'))
+
+    def liveSlots(self) -> list[int]:
+        """Returns the slots that hold a game"""
+        return [slot for slot in range(self.slot_count) if max(self._sequences(slot)) != 0]
+
+    def loadAll(self) -> dict[int, tuple[BoardClass, int, str, bytes]]:
+        """Loads every live game
+
+        The process that loads the games takes them over, so its free slots
+        are worked out again from what is in the segment.
+
+        Returns:
+            The board, number of moves, first move and token of every game, by slot
+        """
+        games = {slot: self.load(slot) for slot in self.liveSlots()}
+        self.free_slots = [slot for slot in reversed(range(self.slot_count)) if slot not in games]
+        return games
+
+    def close(self) -> None:
+        """Detaches from the segment, which stays for other processes"""
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Destroys the segment once no process needs it any more"""
+        self.memory.unlink()
+
+
+def checkpointDriver(store: CheckpointStore, slot: int, driver: GameDriver, token: bytes) -> None:
+    """Saves the game a driver is running
+
+    Args:
+        store: the checkpoint store
+        slot: the slot of the game
+        driver: the driver of the game
+        token: the session token of the game
+
+    """
+    store.save(slot, driver.board, driver.moves, driver.players[0].move, token)
+
+
+def trackDriver(store: CheckpointStore, driver: GameDriver, token: bytes, slot: int | None = None) -> int:
+    """Checkpoints a driver's game after every move and frees its slot when the game is over
+
+    The game is saved right away as well, so call this once the game was
+    started or resumed and a crash before the first move doesn't lose it.
+    The driver's own on_move and on_finish callbacks still run first.
+
+    Args:
+        store: the checkpoint store
+        driver: the driver of the game
+        token: the session token of the game
+        slot: the slot of a game restored from the store, or None to allocate one
+
+    Returns:
+        The slot of the game
+    """
+    if slot is None:
+        slot = store.allocate()
+    on_move = driver.on_move
+    on_finish = driver.on_finish
+
+    def onMove(player: Player, index: tuple[int, int]) -> None:
+        if on_move is not None:
+            on_move(player, index)
+        checkpointDriver(store, slot, driver, token)
+
+    def onFinish(finished: GameDriver) -> None:
+        if on_finish is not None:
+            on_finish(finished)
+        store.free(slot)
+
+    driver.on_move = onMove
+    driver.on_finish = onFinish
+    checkpointDriver(store, slot, driver, token)
+    return slot
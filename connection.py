@@ -0,0 +1,223 @@
+import select
+import socket
+import time
+from typing import Callable
+from gameboard import BoardClass
+from timers import TimerHeap
+from metrics import ACTIVE_CONNECTIONS, SENT_BYTES, RECEIVED_BYTES
+
+# Sent when there is nothing else to send, so the other side knows we are alive.
+# It never appears in names, moves or the 'Play Again'/'Fun Times' messages.
+HEARTBEAT = b'\x00'
+
+
+class PeerTimeoutError(ConnectionError):
+    """Raised when nothing was received from the other player for too long"""
+
+
+class Timeouts:
+    """The timeouts of a connection, all in seconds
+
+    Attributes:
+        read_timeout: how long a single blocking socket call may take
+        idle_timeout: how long the other player may stay silent before it is considered gone
+        move_timeout: how long a player has to make a move, or None for no limit
+        heartbeat_interval: how long we may stay silent before sending a heartbeat
+
+    """
+    def __init__(self,
+                 read_timeout: float = 10,
+                 idle_timeout: float = 30,
+                 move_timeout: float | None = None,
+                 heartbeat_interval: float = 5) -> None:
+        """Initializes the timeouts
+
+        Args:
+            read_timeout: how long a single blocking socket call may take
+            idle_timeout: how long the other player may stay silent before it is considered gone
+            move_timeout: how long a player has to make a move, or None for no limit
+            heartbeat_interval: how long we may stay silent before sending a heartbeat
+
+        """
+        self.read_timeout = read_timeout
+        self.idle_timeout = idle_timeout
+        self.move_timeout = move_timeout
+        self.heartbeat_interval = heartbeat_interval
+
+
+class PeerConnection:
+    """A connection to the other player that sends and filters heartbeats
+
+    Attributes:
+        sock: the socket connected to the other player
+        timeouts: the timeouts of the connection
+        last_recv: the time.monotonic() time anything was last received
+        last_send: the time.monotonic() time anything was last sent
+        closed: whether the connection was closed
+
+    """
+    def __init__(self, sock: socket.socket, timeouts: Timeouts | None = None) -> None:
+        """Initializes the connection
+
+        Args:
+            sock: the socket connected to the other player
+            timeouts: the timeouts of the connection, the defaults if None
+
+        """
+        self.sock = sock
+        self.timeouts = timeouts if timeouts is not None else Timeouts()
+        self.sock.settimeout(self.timeouts.read_timeout)
+        self.last_recv = self.last_send = time.monotonic()
+        self.closed = False
+        ACTIVE_CONNECTIONS.inc()
+
+    def fileno(self) -> int:
+        """Returns the file descriptor of the socket"""
+        return self.sock.fileno()
+
+    def send(self, data: bytes) -> None:
+        """Sends all of data
+
+        Args:
+            data: the bytes to send
+
+        """
+        self.sock.sendall(data)
+        self.last_send = time.monotonic()
+        SENT_BYTES.inc(len(data))
+
+    def heartbeat(self, now: float | None = None) -> None:
+        """Sends a heartbeat if nothing was sent for heartbeat_interval
+
+        Args:
+            now: the current time.monotonic() time
+
+        """
+        if now is None:
+            now = time.monotonic()
+        if now - self.last_send >= self.timeouts.heartbeat_interval:
+            self.send(HEARTBEAT)
+
+    def isIdle(self, now: float | None = None) -> bool:
+        """Checks if the other player has been silent for longer than idle_timeout
+
+        Args:
+            now: the current time.monotonic() time
+
+        Returns:
+            A bool value indicating if the connection is idle
+        """
+        if now is None:
+            now = time.monotonic()
+        return now - self.last_recv > self.timeouts.idle_timeout
+
+    def poll(self, max_bytes: int, timeout: float = 0.0) -> bytes:
+        """Receives up to max_bytes bytes of data without blocking
+
+        Heartbeats are removed from the data, so the result can be shorter
+        than what was received, or empty.
+
+        Args:
+            max_bytes: the most bytes to receive
+            timeout: how long to wait for data to arrive
+
+        Returns:
+            The data that was received
+
+        Raises:
+            ConnectionError: the other player closed the connection
+            PeerTimeoutError: the other player has been silent for too long
+        """
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            if self.isIdle():
+                raise PeerTimeoutError("No response from the other player")
+            return b''
+
+        data = self.sock.recv(max_bytes)
+        if data == b'':
+            raise ConnectionError("The other player disconnected")
+        self.last_recv = time.monotonic()
+        RECEIVED_BYTES.inc(len(data))
+        return data.replace(HEARTBEAT, b'')
+
+    def close(self) -> None:
+        """Closes the connection"""
+        if not self.closed:
+            self.closed = True
+            self.sock.close()
+            ACTIVE_CONNECTIONS.dec()
+
+
+class IdleReaper:
+    """Cleans up connections whose other player went silent
+
+    Every watched connection has one timer on the heap, set to when it would
+    become idle. When the timer fires and nothing was received in the
+    meantime the connection is closed, the game on its board is counted as
+    a forfeit by the silent player and the board is reset. Otherwise the
+    timer is moved to the new deadline. A connection that was closed in the
+    meantime is only forgotten, since its game was already ended.
+
+    Attributes:
+        timers: the heap the deadlines are kept on
+        watched: the timer of every watched connection
+
+    """
+    def __init__(self, timers: TimerHeap) -> None:
+        """Initializes the reaper
+
+        Args:
+            timers: the heap the deadlines are kept on
+
+        """
+        self.timers = timers
+        self.watched = {}
+
+    def watch(self,
+              conn: PeerConnection,
+              board: BoardClass | None,
+              player_name: str,
+              on_reap: Callable[[PeerConnection], None] | None = None) -> None:
+        """Starts watching a connection
+
+        Args:
+            conn: the connection to watch
+            board: the board of the game played over the connection, or None if on_reap ends the games
+            player_name: the name of the player on the other end of conn
+            on_reap: called with the connection after it was cleaned up
+
+        """
+        self.unwatch(conn)
+
+        def check() -> None:
+            if conn.closed:
+                # The game was already ended by whoever closed the connection
+                del self.watched[conn]
+                return
+
+            now = time.monotonic()
+            if not conn.isIdle(now):
+                self.watched[conn] = self.timers.schedule(conn.last_recv + conn.timeouts.idle_timeout, check)
+                return
+
+            del self.watched[conn]
+            conn.close()
+            if board is not None:
+                board.forfeitGame(player_name)
+                board.resetGameBoard()
+            if on_reap is not None:
+                on_reap(conn)
+
+        self.watched[conn] = self.timers.schedule(conn.last_recv + conn.timeouts.idle_timeout, check)
+
+    def unwatch(self, conn: PeerConnection) -> None:
+        """Stops watching a connection
+
+        Args:
+            conn: the connection to stop watching
+
+        """
+        timer = self.watched.pop(conn, None)
+        if timer is not None:
+            self.timers.cancel(timer)
@@ -0,0 +1,206 @@
+import array
+import mmap
+import os
+import struct
+from gameboard import BoardClass
+
+# The file starts with the magic bytes and the layout version, followed by the counts
+FILE_HEADER = struct.Struct('<4sI')
+MAGIC = b'TTTO'
+VERSION = 1
+
+POSITIONS = 3 ** 9
+
+# The counts kept for every position
+VISITS = 0
+X_WINS = 1
+O_WINS = 2
+DRAWS = 3
+FIELDS = 4
+
+# The 8 ways to rotate and flip the board, as the old block of every new block
+SYMMETRIES = [[row * 3 + col for row in range(3) for col in range(3)]]
+for _ in range(3):
+    SYMMETRIES.append([SYMMETRIES[-1][(2 - col) * 3 + row] for row in range(3) for col in range(3)])
+SYMMETRIES += [[symmetry[row * 3 + 2 - col] for row in range(3) for col in range(3)] for symmetry in SYMMETRIES]
+
+
+def digitsOf(code: int) -> list[int]:
+    """Get the block values of a position code
+
+    Args:
+        code: a code made by BoardClass.getPositionCode
+
+    Returns:
+        The value of every block, 0 for empty, 1 for 'x' and 2 for 'o'
+    """
+    digits = [0] * 9
+    for i in range(8, -1, -1):
+        code, digits[i] = divmod(code, 3)
+    return digits
+
+
+# The canonical code of every code, filled in the first time it is needed
+_canonical = array.array('H', [0xFFFF]) * POSITIONS
+
+
+def canonicalCode(code: int) -> int:
+    """Get the code shared by a position and all its rotations and reflections
+
+    Args:
+        code: a code made by BoardClass.getPositionCode
+
+    Returns:
+        The smallest code of the 8 rotated and flipped positions
+    """
+    canonical = _canonical[code]
+    if canonical == 0xFFFF:
+        digits = digitsOf(code)
+        canonical = POSITIONS
+        for symmetry in SYMMETRIES:
+            value = 0
+            for block in symmetry:
+                value = value * 3 + digits[block]
+            canonical = min(canonical, value)
+        _canonical[code] = canonical
+    return canonical
+
+
+class OpeningIndex:
+    """Visit and result counts for every position reached in recorded games
+
+    Positions are keyed by their canonical code, so a position and its
+    rotations and reflections share their counts. There are only 3**9
+    codes, so the counts are one flat array of unsigned 32 bit integers,
+    four per code, and a lookup is a single index. The array is written to
+    disk as it is, so a saved index can be memory-mapped and queried or
+    updated in place without loading it.
+
+    Attributes:
+        counts: the visits, x wins, o wins and draws of every code
+        file: the open file the counts are mapped from, or None
+        mapping: the memory map of the file, or None
+
+    """
+    def __init__(self) -> None:
+        """Initializes an empty index in memory"""
+        self.counts = array.array('I', bytes(4 * FIELDS * POSITIONS))
+        self.file = None
+        self.mapping = None
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False) -> 'OpeningIndex':
+        """Memory-maps a saved index
+
+        Args:
+            path: the file the index was saved to
+            writable: whether added games are written straight to the file
+
+        Returns:
+            The index
+        """
+        index = cls.__new__(cls)
+        index.file = open(path, 'r+b' if writable else 'rb')
+        index.mapping = mmap.mmap(index.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(index.mapping, 0)
+        if magic != MAGIC or version != VERSION:
+            index.close()
+            raise ValueError(path + " is not an opening index")
+        index.counts = memoryview(index.mapping)[FILE_HEADER.size:].cast('I')
+        return index
+
+    def save(self, path: str) -> None:
+        """Writes the index to a file
+
+        Args:
+            path: the file to write to
+
+        """
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(FILE_HEADER.pack(MAGIC, VERSION))
+            file.write(self.counts)
+        os.replace(temp_path, path)
+
+    def close(self) -> None:
+        """Releases the memory map, if any"""
+        if self.mapping is not None:
+            if isinstance(self.counts, memoryview):
+                self.counts.release()
+            self.mapping.close()
+            self.file.close()
+            self.mapping = None
+            self.file = None
+
+    def addGame(self, moves: list[tuple[tuple[int, int], str]], winner: str | None) -> None:
+        """Adds a finished game to the index
+
+        Every position of the game, the empty board included, gets a visit
+        and the result of the game.
+
+        Args:
+            moves: the index and move, 'x' or 'o', of every move in order
+            winner: 'x' or 'o', or None for a tie
+
+        """
+        result = X_WINS if winner == 'x' else O_WINS if winner == 'o' else DRAWS
+        counts = self.counts
+        code = 0
+        for i in range(len(moves) + 1):
+            base = canonicalCode(code) * FIELDS
+            counts[base + VISITS] += 1
+            counts[base + result] += 1
+            if i < len(moves):
+                (row, col), move = moves[i]
+                code += (1 if move == 'x' else 2) * 3 ** (8 - (row * 3 + col))
+
+    def addBoardGame(self, moves: list[tuple[tuple[int, int], str]], board: BoardClass) -> None:
+        """Adds a finished game, taking the result from its board
+
+        The last player to move is the winner unless the game is a tie.
+
+        Args:
+            moves: the index and move, 'x' or 'o', of every move in order, as passed to updateGameBoard
+            board: the board of the finished game
+
+        Raises:
+            ValueError: the board isn't a 3x3 board
+        """
+        if board.GRID_SIZE != 3:
+            raise ValueError("Only games on 3x3 boards can be indexed")
+        if board.getResult() == 'Tie' or not moves:
+            self.addGame(moves, None)
+        else:
+            self.addGame(moves, moves[-1][1])
+
+    def stats(self, board: BoardClass) -> tuple[int, int, int, int]:
+        """Get the counts of the position on a board
+
+        Args:
+            board: the board
+
+        Returns:
+            The number of visits, x wins, o wins and draws
+
+        Raises:
+            ValueError: the board isn't a 3x3 board
+        """
+        if board.GRID_SIZE != 3:
+            raise ValueError("Only games on 3x3 boards are indexed")
+        base = canonicalCode(board.getPositionCode()) * FIELDS
+        return tuple(self.counts[base:base + FIELDS])
+
+    def winRate(self, board: BoardClass, move: str) -> (float | None):
+        """Get how often the games that reached a position were won by a player
+
+        Args:
+            board: the board
+            move: the player's move, either 'x' or 'o'
+
+        Returns:
+            The share of games won, or None if the position was never reached
+        """
+        visits, x_wins, o_wins, _ = self.stats(board)
+        if visits == 0:
+            return None
+        return (x_wins if move == 'x' else o_wins) / visits
@@ -1,6 +1,20 @@
+import sys
+
+# The bits of the blocks in every row, column and diagonal.
+# The block at index (row, col) is bit row * 3 + col.
+WIN_MASKS = (0b000000111, 0b000111000, 0b111000000,
+             0b001001001, 0b010010010, 0b100100100,
+             0b100010001, 0b001010100)
+FULL_MASK = 0b111111111
+
+
 class BoardClass:
     """The Tic-Tac-Toe game board
 
+        The board is packed into two 9 bit masks, one for the 'x' moves and
+        one for the 'o' moves, and the instance uses __slots__, so a game
+        takes a few hundred bytes and a host can keep many of them.
+
         Attributes:
             player_name: Player's user name
             other_player_name: The other player's name
@@ -8,12 +22,30 @@ class BoardClass:
             number_of_win: Number of times the player won
             number_of_ties: Number of tied games
             number_of_losses: Number of times the player lost
+            number_of_forfeits: Number of games that ended with a player forfeiting
             games_played: the total number of games played
-            board: the tic-tac-toe board represented by a 2D array. All values are initialized as 0
+            x_mask: the blocks taken by 'x', the block at (row, col) is bit row * 3 + col
+            o_mask: the blocks taken by 'o', laid out like x_mask
+            board: the tic-tac-toe board represented by a 2D array. Empty blocks are 0
     """
+    # The number of blocks across and down the board drawn on screen
+    GRID_SIZE = 3
+
+    __slots__ = ('player_name', 'other_player_name', 'name_of_last_player',
+                 'number_of_win', 'number_of_ties', 'number_of_losses', 'number_of_forfeits',
+                 'games_played', 'result', 'x_mask', 'o_mask')
     
     def __init__(self) -> None:
         """The tic-tac-toe game board
+        """
+        self.resetAll()
+
+    def resetAll(self) -> None:
+        """Resets the names, the scores and the board
+
+        Leaves the board as if it was just created, so it can be reused
+        for a new pair of players
+
         """
         self.player_name = ''
         self.other_player_name = ''
@@ -21,9 +53,31 @@ class BoardClass:
         self.number_of_win = 0
         self.number_of_ties = 0
         self.number_of_losses = 0
+        self.number_of_forfeits = 0
         self.games_played = 0
         self.result = ''
-        self.board = [[0,0,0] for _ in range(3)]
+        self.x_mask = 0
+        self.o_mask = 0
+
+    @property
+    def board(self) -> list[list]:
+        """The board as a 3x3 2D array of 'x', 'o' and 0 for empty blocks
+
+        A new array is built every time, so changing it doesn't change the board.
+        """
+        return [['x' if self.x_mask >> (row * 3 + col) & 1 else 'o' if self.o_mask >> (row * 3 + col) & 1 else 0
+                 for col in range(3)] for row in range(3)]
+
+    @board.setter
+    def board(self, board: list[list]) -> None:
+        """Sets the board from a 3x3 2D array of 'x', 'o' and 0 for empty blocks"""
+        self.x_mask = self.o_mask = 0
+        for row in range(3):
+            for col in range(3):
+                if board[row][col] == 'x':
+                    self.x_mask |= 1 << (row * 3 + col)
+                elif board[row][col] == 'o':
+                    self.o_mask |= 1 << (row * 3 + col)
 
     def updateGamesPlayed(self) -> None:
         """Updates how many games were played
@@ -37,10 +91,11 @@ class BoardClass:
     def resetGameBoard(self) -> None:
         """Resets the game board
 
-        Reinitialize the board by setting it to a 3x3 2D array of 0s
+        Reinitialize the board by clearing both masks
         
         """
-        self.board = [[0,0,0] for _ in range(3)]
+        self.x_mask = 0
+        self.o_mask = 0
 
     def updateGameBoard(self, index : tuple, move : str, player_name: str) -> None:
         """Updates the game board
@@ -54,15 +109,86 @@ class BoardClass:
             player_name: the name of the player that made the move
 
         """
-        self.board[index[0]][index[1]] = move
+        bit = 1 << (index[0] * 3 + index[1])
+        if move == 'x':
+            self.x_mask |= bit
+            self.o_mask &= ~bit
+        else:
+            self.o_mask |= bit
+            self.x_mask &= ~bit
         self.name_of_last_player = player_name
 
+    def isValidMove(self, index: tuple) -> bool:
+        """Checks if a move can be made at index
+
+        A move is valid when the index is on the board and the
+        block at that location is still empty
+
+        Args:
+            index: the location of the move
+
+        Returns:
+            A bool value indicating if the move is valid
+
+        """
+        row, col = index
+        if not (0 <= row < 3 and 0 <= col < 3):
+            return False
+        return not (self.x_mask | self.o_mask) >> (row * 3 + col) & 1
+
+    def legalMoves(self) -> list[tuple]:
+        """Get every move that can be made
+
+        Returns:
+            The index of every empty block
+        """
+        free = ~(self.x_mask | self.o_mask) & FULL_MASK
+        return [(bit // 3, bit % 3) for bit in range(9) if free >> bit & 1]
+
+    def indexOfCell(self, x: int, y: int) -> tuple:
+        """Get the index of a move from the block clicked on screen
+
+        Args:
+            x: the column of the block on screen
+            y: the row of the block on screen
+
+        Returns:
+            The index of the move
+        """
+        return (x, y)
+
+    def cellOfIndex(self, index: tuple) -> tuple[int, int]:
+        """Get the block on screen a move is drawn on
+
+        Args:
+            index: the index of the move
+
+        Returns:
+            The column and row of the block on screen
+        """
+        return (index[0], index[1])
+
+    def getPositionCode(self) -> int:
+        """Get a number that identifies the position on the board
+
+        Reads the board row by row as a base 3 number where an empty
+        block is 0, 'x' is 1 and 'o' is 2. Two boards have the same
+        code exactly when the same moves are on the same blocks.
+
+        Returns:
+            The code of the position, between 0 and 3**9 - 1
+
+        """
+        code = 0
+        for bit in range(9):
+            code = code * 3 + (self.x_mask >> bit & 1) + 2 * (self.o_mask >> bit & 1)
+        return code
+
     def isWinner(self) -> bool:
         """Checks if the current game board has a winner
 
-        Check the rows, columns, and diagonals if there are same three
-        characters that are not 0 
-        If so, set winner to a non-empty string.
+        Check the rows, columns, and diagonals if either mask has all
+        three of their bits set.
         Update the wins and losses. If the last player to make a move is
         the player, then it's a win, otherwise it's a lose.
 
@@ -70,34 +196,16 @@ class BoardClass:
             A bool value indicating if there is a winner.
         
         """
-        winner = ''
-        # Check rows
-        for i in range(3):
-            if self.board[i].count('x') == 3:
-                winner = 'p1'
-            if self.board[i].count('o') == 3:
-                winner = 'p2'
-        
-        # Check columns
-        for i in range(3):
-            if self.board[0][i] == self.board[1][i] == self.board[2][i] != 0:
-                winner = 'someone'
-        
-        # Check diagonal
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] != 0:
-            winner = 'someone'
-        if self.board[2][0] == self.board[1][1] == self.board[0][2] != 0:
-            winner = 'someone'
-        
-        # Update the game score and return True
-        if winner != '':
-            if self.name_of_last_player == self.player_name:
-                self.result = 'You have won'
-                self.number_of_win += 1
-            else:
-                self.result = 'You have lost'
-                self.number_of_losses += 1
-            return True
+        for line in WIN_MASKS:
+            if self.x_mask & line == line or self.o_mask & line == line:
+                # Update the game score and return True
+                if self.name_of_last_player == self.player_name:
+                    self.result = 'You have won'
+                    self.number_of_win += 1
+                else:
+                    self.result = 'You have lost'
+                    self.number_of_losses += 1
+                return True
 
         # Return False if nobody is winning
         return False
@@ -106,20 +214,36 @@ class BoardClass:
     def boardIsFull(self) -> bool:
         """Checks if the board is full
 
-        Checks if the board is full by checking if there is any 0 left,
-        which is the default value. Update the tie count if the
-        board is full
+        Checks if the board is full by checking if every block is in
+        one of the masks. Update the tie count if the board is full
 
         Returns:
             A bool value that indicates if the board is full
         """
-        for i in self.board:
-            if 0 in i:
-                return False
+        if self.x_mask | self.o_mask != FULL_MASK:
+            return False
         self.result = 'Tie'
         self.number_of_ties += 1
         return True
 
+    def forfeitGame(self, player_name: str) -> None:
+        """Ends the game with a player forfeiting
+
+        The player that forfeits loses the game. Update the wins or losses
+        the same way isWinner does, and count the forfeit.
+
+        Args:
+            player_name: the name of the player that forfeits
+
+        """
+        if player_name == self.player_name:
+            self.result = 'You have lost'
+            self.number_of_losses += 1
+        else:
+            self.result = 'You have won'
+            self.number_of_win += 1
+        self.number_of_forfeits += 1
+
     def computeStats(self) -> str:
         """Return the game statistic as a string
 
@@ -130,6 +254,7 @@ class BoardClass:
         the number of wins
         the number of losses
         the number of ties
+        the number of forfeits
 
         Returns:
             the string representation of the game stats
@@ -142,6 +267,7 @@ class BoardClass:
         result += "Number of wins: {0}\n".format(self.number_of_win)
         result += "Number of losses: {0}\n".format(self.number_of_losses)
         result += "Number of ties: {0}\n".format(self.number_of_ties)
+        result += "Number of forfeits: {0}\n".format(self.number_of_forfeits)
         return result
 
     def checkGameEnd(self) -> bool:
@@ -171,7 +297,7 @@ class BoardClass:
         
         """
         
-        self.player_name = name
+        self.player_name = sys.intern(name)
     
     def setOtherPlayerName(self, name: str) -> None:
         """Set the other_player_name to name
@@ -181,7 +307,7 @@ class BoardClass:
         
         """
         
-        self.other_player_name = name
+        self.other_player_name = sys.intern(name)
     
     def getOtherPlayerName(self) -> str:
         """Get the other player's name
@@ -2,6 +2,10 @@ import pygame
 import gui
 import sys
 from gameboard import BoardClass
+from ultimate import UltimateBoardClass
+from players import Player, RemotePlayer, GameDriver
+from connection import PeerConnection
+import select
 import socket
 import time
 
@@ -22,6 +26,12 @@ def getInfoScreen(screen: pygame.Surface) -> tuple[str, str, str]:
     name_entry = gui.EntryBox(screen, 20, 180, 300, 50, 'Name:')
     submit_button = gui.Button(screen, "Submit", 20, 260, 30)
 
+    # Only the widget an event concerns gets to handle it
+    router = gui.EventRouter()
+    router.on(pygame.QUIT, lambda event: sys.exit(0))
+    for widget in (host_entry, port_entry, name_entry, submit_button):
+        router.add(widget)
+
     # Manages framerate
     clock = pygame.time.Clock()
 
@@ -30,12 +40,7 @@ def getInfoScreen(screen: pygame.Surface) -> tuple[str, str, str]:
 
         # Handles event
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit(0)
-            host_entry.handleEvent(event)
-            port_entry.handleEvent(event)
-            name_entry.handleEvent(event)
-            submit_button.handleEvent(event)
+            router.dispatch(event)
         
         # Checks if the button is pressed
         if submit_button.isPressed():
@@ -57,12 +62,13 @@ def getInfoScreen(screen: pygame.Surface) -> tuple[str, str, str]:
         pygame.display.update()
         clock.tick(30)
 
-def optionScreen(screen: pygame.Surface, msg: str) -> None:
+def optionScreen(screen: pygame.Surface, msg: str, conn: PeerConnection | None = None) -> None:
     """"An option screen that prompts the user for a yes or no answer
     
     Args:
         screen: the screen to draw on
         msg: the message that displays on the screen
+        conn: the connection to keep alive with heartbeats while waiting, if any
 
     """
     # Manages framerate
@@ -73,22 +79,28 @@ def optionScreen(screen: pygame.Surface, msg: str) -> None:
     y_button = gui.Button(screen, 'Yes', 20, 60, 30)
     n_button = gui.Button(screen, 'No', 70, 60, 30)
 
+    # Only the button an event concerns gets to handle it
+    router = gui.EventRouter()
+    router.on(pygame.QUIT, lambda event: sys.exit(0))
+    router.add(y_button)
+    router.add(n_button)
+
     # Renders the screen
     while True:
         screen.fill((0, 0, 0))
 
         # Handles user input
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit(0)
-            y_button.handleEvent(event)
-            n_button.handleEvent(event)
+            router.dispatch(event)
         
         if y_button.isPressed():
             return True
 
         if n_button.isPressed():
             return False
+
+        if conn is not None:
+            conn.heartbeat()
         
         # Draws the objects and updates the screen
         msg.draw_me()
@@ -97,61 +109,165 @@ def optionScreen(screen: pygame.Surface, msg: str) -> None:
         pygame.display.update()
         clock.tick(30)
 
-def checkBlocks(blocks: list[list[gui.Block]], event: pygame.event.Event) -> (tuple[int, int] | None):
-    """Handle the events for all the blocks
+def drawBoard(screen: pygame.Surface,
+              grid: gui.BlockGrid,
+              board: BoardClass | None = None,
+              show_forced: bool = True) -> None:
+    """Draw the tic-tac-toe board and update the screen
     
     Args:
-        blocks: the blocks to check
-        event: the event to handle
-    
-    Returns:
-        A tuple that contains the indices of the block that was clicked
+        screen: the screen to draw on
+        grid: the blocks to draw
+        board: the board the blocks show, needed to mark the small boards of an ultimate board
+        show_forced: whether to highlight the small board the next move must be made on
 
     """
-    for i in range(3):
-        for j in range(3):
-            if blocks[i][j].handleEvent(event):
-                return (i, j)
-    
-    return None
+    grid.draw_me()
+    drawGridLines(screen, grid)
+    if isinstance(board, UltimateBoardClass):
+        drawSmallBoards(screen, grid, board, show_forced)
+    pygame.display.update()
+
+def drawSmallBoards(surface: pygame.Surface, grid: gui.BlockGrid, board: UltimateBoardClass, show_forced: bool) -> None:
+    """Mark the small boards of an ultimate board
+
+    A small board that was won gets a large x or circle over it, a drawn
+    one is greyed out and the one the next move must be made on is
+    outlined, so it is clear where a move can be made.
+
+    Args:
+        surface: the surface to draw on
+        grid: the blocks of the board
+        board: the ultimate board
+        show_forced: whether to outline the small board the next move must be made on
+
+    """
+    size = 3 * grid.block_size
+    shade = pygame.Surface((size, size), pygame.SRCALPHA)
+    shade.fill((128, 128, 128, 110))
+    for small_board in range(9):
+        x, y = board.cellOfIndex((small_board, 0))
+        area = pygame.Rect(grid.left + x * grid.block_size, grid.top + y * grid.block_size, size, size)
+        if board.x_mask >> small_board & 1:
+            pygame.draw.line(surface, (0, 128, 255), area.topleft, area.bottomright, 6)
+            pygame.draw.line(surface, (0, 128, 255), area.topright, area.bottomleft, 6)
+        elif board.o_mask >> small_board & 1:
+            pygame.draw.circle(surface, (0, 128, 255), area.center, size / 2 - 4, 6)
+        elif board.drawn_mask >> small_board & 1:
+            surface.blit(shade, area.topleft)
+        elif show_forced and small_board == board.forced:
+            pygame.draw.rect(surface, (255, 255, 0), area, 4)
+
+def createGrid(screen: pygame.Surface, board: BoardClass) -> gui.BlockGrid:
+    """Create the blocks for a board
+
+    The blocks fill the same square whatever the size of the board
 
-def drawBoard(screen: pygame.Surface, blocks: list[list[gui.Block]]) -> None:
-    """Draw the tic-tac-toe board and update the screen
-    
     Args:
         screen: the screen to draw on
-        blocks: the blocks to draw
+        board: the board, which decides how many blocks there are
 
+    Returns:
+        The blocks
     """
-    for i in blocks:
-        for j in i:
-            j.draw_me()
+    return gui.BlockGrid(screen, 10, 10, 579 // board.GRID_SIZE, board.GRID_SIZE, board.GRID_SIZE)
 
-    # Vertical lines
-    for i in range(4):
-        pygame.draw.line(screen, (255, 255, 255), (10 + i * 193, 10), (10 + i * 193, 589), 2)
-    
-    # Horizontal lines
-    for i in range(4):
-        pygame.draw.line(screen, (255, 255, 255), (10, 10 + i * 193), (589, 10 + i * 193), 2)         
-            
-    pygame.display.update()
+def drawGridLines(surface: pygame.Surface, grid: gui.BlockGrid) -> None:
+    """Draw the lines between the blocks of the board
+
+    On a board larger than 3x3, the lines around every 3x3 group of
+    blocks are thicker than the others
+
+    Args:
+        surface: the surface to draw on, the screen or an off-screen surface
+        grid: the blocks to draw the lines between
+
+    """
+    start = grid.left
+    end = grid.left + grid.columns * grid.block_size
+    for i in range(grid.columns + 1):
+        width = 2
+        if grid.columns > 3:
+            width = 3 if i % 3 == 0 else 1
+        position = grid.left + i * grid.block_size
+
+        # Vertical line
+        pygame.draw.line(surface, (255, 255, 255), (position, start), (position, end), width)
+
+        # Horizontal line
+        pygame.draw.line(surface, (255, 255, 255), (start, position), (end, position), width)
+
+class MousePlayer(Player):
+    """The player in front of the screen, moving by clicking on the blocks
+
+    Attributes:
+        grid: the blocks of the board
+        board: the board the pending move will be made on
+
+    """
+    def __init__(self, name: str, move: str, grid: gui.BlockGrid) -> None:
+        """Initializes the mouse player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+            grid: the blocks of the board
+
+        """
+        super().__init__(name, move)
+        self.grid = grid
+        self.board = None
+
+    def requestMove(self, board: BoardClass, deadline: float | None = None) -> None:
+        """Starts listening for clicks on the board"""
+        super().requestMove(board, deadline)
+        self.board = board
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Handles the queued events and returns the move on the block that was clicked
+
+        Returns:
+            The index of the move, or None if no valid block was clicked
+
+        """
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit(0)
+
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                cell = self.grid.cellAt(event.pos)
+                if cell != None and self.board.isValidMove(self.board.indexOfCell(*cell)):
+                    return self.board.indexOfCell(*cell)
 
-def gameLoop(player_board: BoardClass, player_s: socket.socket, screen: pygame.Surface, receive: bool, move: str) -> None:
+        return None
+
+
+def gameLoop(player_board: BoardClass,
+             player_conn: PeerConnection,
+             screen: pygame.Surface,
+             receive: bool,
+             move: str,
+             grid: gui.BlockGrid | None = None) -> None:
     """The game loop
+
+    If a player runs out of time or the connection is lost, the game is
+    counted as a forfeit, the connection is closed and the results are shown.
     
     Args:
         player_board: the player's gameBoard
-        player_s: the player's socket
+        player_conn: the player's connection
         screen: the screen to draw on
         receive: whether the player starts by receiving
         move: the player's move, either 'x' or 'o'
+        grid: the blocks of the previous game, cleared and reused instead of creating new ones
 
     """
-    blocks = [[gui.Block(screen, 10 + x * 193, 10 + y * 193, 193) for y in range(3)] for x in range(3)]
-    player_board.resetGameBoard()
+    if grid is None:
+        grid = createGrid(screen, player_board)
+    else:
+        grid.reset()
+    blocks = grid.blocks
     msg = gui.Text(screen, 10, 650, '')
-    receiving = receive
     clock = pygame.time.Clock()
     ggs = gui.Text(screen, 400, 650, player_board.getResult())
     other_player_move = ''
@@ -161,70 +277,55 @@ def gameLoop(player_board: BoardClass, player_s: socket.socket, screen: pygame.S
     else:
         other_player_move = 'o'
 
-    while True:
-        if receiving:
-            screen.fill((0, 0, 0))
-            msg.update(player_board.getOtherPlayerName() + "\'s move")
-            drawBoard(screen, blocks)
-
-            #Receive move
-            data = player_s.recv(1)
-            x_cor = int(data.decode('ascii'))
-            data = player_s.recv(1)
-            y_cor = int(data.decode('ascii'))
-
-            player_board.updateGameBoard((x_cor, y_cor), other_player_move, player_board.getOtherPlayerName())
-            if other_player_move == 'o':
-                blocks[x_cor][y_cor].drawCircle()
-            else:
-                blocks[x_cor][y_cor].drawX()
-
-            #Check winning condition, end the game if the game is over
-            if player_board.checkGameEnd():
-                drawBoard(screen, blocks)
-                ggs.update(player_board.getResult())
-                pygame.display.update()
-                time.sleep(2)
-                return
-            receiving = False
-        
-        if receiving == False:
-            screen.fill((0, 0, 0))
-            msg.update("Your move")
-            drawBoard(screen, blocks)
+    local = MousePlayer(player_board.getPlayerName(), player_move, grid)
+    remote = RemotePlayer(player_board.getOtherPlayerName(), other_player_move, player_conn)
+    players = [remote, local] if receive else [local, remote]
 
-            # Check event
+    def onMove(player: Player, index: tuple[int, int]) -> None:
+        # Draw the move on its block
+        x, y = player_board.cellOfIndex(index)
+        blocks[x][y].type = 'taken'
+        if player.move == 'o':
+            blocks[x][y].drawCircle()
+        else:
+            blocks[x][y].drawX()
+
+    def onTick(driver: GameDriver) -> None:
+        if driver.current() is remote:
+            # Keep the window responsive while waiting for the other player
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    player_s.close()
+                    player_conn.close()
                     sys.exit(0)
+            msg_text = player_board.getOtherPlayerName() + "\'s move"
+        else:
+            msg_text = "Your move"
+            if isinstance(player_board, UltimateBoardClass) and player_board.forced != -1:
+                msg_text = "Your move, in the outlined board"
 
-                coord = checkBlocks(blocks, event)
-                if coord != None:
-                    # Send the valid move
-                    player_s.send(str(coord[0]).encode('ascii'))
-                    player_s.send(str(coord[1]).encode('ascii'))
-
-                    # Update board
-                    player_board.updateGameBoard(coord, player_move, player_board.getPlayerName())
-                    if player_move == 'o':
-                        blocks[coord[0]][coord[1]].drawCircle()
-                    else:
-                        blocks[coord[0]][coord[1]].drawX()
-
-                    #Check winning condition, end the game if the game is over
-                    if player_board.checkGameEnd():
-                        drawBoard(screen, blocks)
-                        ggs.update(player_board.getResult())
-                        pygame.display.update()
-                        time.sleep(2)
-                        return
-                    
-                    receiving = True
-
-        pygame.display.update()       
+        screen.fill((0, 0, 0))
+        msg.update(msg_text)
+        drawBoard(screen, grid, player_board)
+        player_conn.heartbeat()
         clock.tick(30)
 
+    driver = GameDriver(player_board, players, player_conn.timeouts.move_timeout, onMove)
+    try:
+        driver.run(onTick)
+    except SystemExit:
+        player_conn.close()
+        raise
+
+    # The game is over
+    drawBoard(screen, grid, player_board, False)
+    ggs.update(player_board.getResult())
+    pygame.display.update()
+    time.sleep(2)
+
+    if driver.forfeited is not None:
+        player_conn.close()
+        resultScreen(screen, player_board)
+
 def resultScreen(screen: pygame.Surface, player_board: BoardClass) -> None:
     """The screen that shows the result
     
@@ -248,27 +349,39 @@ def resultScreen(screen: pygame.Surface, player_board: BoardClass) -> None:
         
         pygame.display.update()
 
-def postGameScreen(screen: pygame.Surface, p2_s: socket.socket, p2_board: BoardClass) -> None:
+def postGameScreen(screen: pygame.Surface, p2_conn: PeerConnection, p2_board: BoardClass) -> None:
     """The waiting screen for player 2 after the game is over
 
     Attributes:
         screen: the screen to draw on
-        p2_s: the player 2's socket
+        p2_conn: the player 2's connection
         p2_board: player 2's game board
 
     """
     msg = gui.Text(screen, 20, 20, "Waiting for " + p2_board.getOtherPlayerName() + "\'s response")
     clock = pygame.time.Clock()
+    response = b''
     while True:
         screen.fill((0, 0, 0))
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                p2_conn.close()
+                sys.exit(0)
         msg.draw_me()
         pygame.display.update()
-        if p2_s.recv(10).decode('ascii') != 'Play Again':
-            p2_s.close()
-            resultScreen(screen, p2_board)
-        else:
+
+        try:
+            p2_conn.heartbeat()
+            response += p2_conn.poll(10 - len(response))
+        except OSError:
+            # Player 1 is gone, there is nobody to play again with
+            response = b'Fun Times'
+
+        if response == b'Play Again':
             return
-        pygame.display.udpate()
+        if not b'Play Again'.startswith(response):
+            p2_conn.close()
+            resultScreen(screen, p2_board)
         clock.tick(30)
 
 def serverEstablishedScreen(screen: pygame.Surface, server_socket: socket.socket) -> socket.socket:
@@ -282,8 +395,46 @@ def serverEstablishedScreen(screen: pygame.Surface, server_socket: socket.socket
         A socket that represents the conenction to the client
     """
     msg = gui.Text(screen, 20, 20, "Server established. Waiting for player 1 connection")
+    clock = pygame.time.Clock()
     while True:
         screen.fill((0, 0, 0))
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                server_socket.close()
+                sys.exit(0)
         msg.draw_me()
         pygame.display.update()
-        return server_socket.accept()[0]
\ No newline at end of file
+
+        # Only accept once player 1 is waiting, so the window stays responsive
+        readable, _, _ = select.select([server_socket], [], [], 0)
+        if readable:
+            return server_socket.accept()[0]
+        clock.tick(30)
+
+def variantScreen(screen: pygame.Surface, p2_conn: PeerConnection, p2_board: BoardClass) -> bool:
+    """The waiting screen for player 2 while player 1 picks the game to play
+
+    Args:
+        screen: the screen to draw on
+        p2_conn: the player 2's connection
+        p2_board: player 2's game board
+
+    Returns:
+        A bool value indicating if player 1 picked ultimate tic-tac-toe
+    """
+    msg = gui.Text(screen, 20, 20, "Waiting for " + p2_board.getOtherPlayerName() + " to pick the game")
+    clock = pygame.time.Clock()
+    while True:
+        screen.fill((0, 0, 0))
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                p2_conn.close()
+                sys.exit(0)
+        msg.draw_me()
+        pygame.display.update()
+
+        p2_conn.heartbeat()
+        response = p2_conn.poll(1)
+        if response != b'':
+            return response == b'u'
+        clock.tick(30)
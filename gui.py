@@ -278,6 +278,11 @@ class Block(pygame.Rect):
             
         return False
             
+    def reset(self) -> None:
+        """Clears the block so it can be used for a new game"""
+        self.surface.fill((0, 0, 0))
+        self.type = 'empty'
+
     def drawCircle(self) -> None:
         """Draws a circle on the block"""
         pygame.draw.circle(self.surface, (255, 0, 0), (self.width / 2, self.width / 2), self.width / 2, 2)
@@ -292,6 +297,174 @@ class Block(pygame.Rect):
         self.screen.blit(self.surface, (self.left, self.top))
 
 
+class BlockGrid(pygame.Rect):
+    """A grid of blocks that finds the clicked block with arithmetic
+
+    Attributes:
+        screen: the screen to draw on
+        columns: the number of blocks across
+        rows: the number of blocks down
+        block_size: the width and height of every block
+        blocks: the blocks, indexed as blocks[column][row]
+
+    """
+    def __init__(self,
+                 screen: pygame.Surface,
+                 left: float,
+                 top: float,
+                 size: float,
+                 columns: int = 3,
+                 rows: int = 3) -> None:
+        """Initializes the grid
+
+        Args:
+            screen: the screen to draw on
+            left: the x coordinate
+            top: the y coordinate
+            size: the width and height of every block
+            columns: the number of blocks across
+            rows: the number of blocks down
+
+        """
+        super().__init__(left, top, size * columns, size * rows)
+        self.screen = screen
+        self.columns = columns
+        self.rows = rows
+        self.block_size = size
+        self.blocks = [[Block(screen, left + x * size, top + y * size, size) for y in range(rows)] for x in range(columns)]
+
+    def cellAt(self, pos: tuple[int, int]) -> (tuple[int, int] | None):
+        """Get the indices of the block at a position
+
+        Args:
+            pos: the position on the screen
+
+        Returns:
+            The indices of the block, or None if pos is outside the grid
+        """
+        if not self.collidepoint(pos):
+            return None
+        return (int((pos[0] - self.left) // self.block_size), int((pos[1] - self.top) // self.block_size))
+
+    def reset(self) -> None:
+        """Clears every block so the grid can be used for a new game"""
+        for column in self.blocks:
+            for block in column:
+                block.reset()
+
+    def draw_me(self) -> None:
+        """Draw every block on the screen"""
+        for column in self.blocks:
+            for block in column:
+                block.draw_me()
+
+
+class EventRouter:
+    """Sends every event only to the widgets it concerns
+
+    Widgets are kept in a spatial index of square cells, so the widget under
+    the mouse is found by looking at a single cell. Mouse clicks go to the
+    widget under the mouse and to the widget that had focus before, so it
+    can deactivate. Every other event goes to the focused widget only.
+
+    Attributes:
+        cell_size: the width and height of the cells of the spatial index
+        cells: the widgets that overlap every cell, in the order they were added
+        handlers: the functions to call for every event type
+        focus: the widget that was clicked last, or None
+
+    """
+    def __init__(self, cell_size: int = 100) -> None:
+        """Initializes the router
+
+        Args:
+            cell_size: the width and height of the cells of the spatial index
+
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.handlers = {}
+        self.focus = None
+
+    def _cellsOf(self, rect: pygame.Rect) -> list[tuple[int, int]]:
+        """Returns the cells a rectangle overlaps"""
+        return [(x, y)
+                for x in range(rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1)
+                for y in range(rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1)]
+
+    def add(self, widget: pygame.Rect) -> None:
+        """Starts sending events to a widget
+
+        Args:
+            widget: a widget with a handleEvent method
+
+        """
+        for cell in self._cellsOf(widget):
+            self.cells.setdefault(cell, []).append(widget)
+
+    def remove(self, widget: pygame.Rect) -> None:
+        """Stops sending events to a widget
+
+        Args:
+            widget: a widget that was added
+
+        """
+        for cell in self._cellsOf(widget):
+            # Rects with the same position compare equal, so compare identities
+            self.cells[cell] = [other for other in self.cells[cell] if other is not widget]
+        if self.focus is widget:
+            self.focus = None
+
+    def on(self, event_type: int, handler) -> None:
+        """Calls handler with every event of a type
+
+        Args:
+            event_type: the type of the events, e.g. pygame.QUIT
+            handler: the function to call with the event
+
+        """
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def widgetAt(self, pos: tuple[int, int]) -> (pygame.Rect | None):
+        """Get the widget at a position
+
+        Args:
+            pos: the position on the screen
+
+        Returns:
+            The widget added last among those at pos, or None
+        """
+        for widget in reversed(self.cells.get((pos[0] // self.cell_size, pos[1] // self.cell_size), ())):
+            if widget.collidepoint(pos):
+                return widget
+        return None
+
+    def dispatch(self, event: pygame.event.Event):
+        """Sends an event to its handlers and the widget it concerns
+
+        Args:
+            event: the event to send
+
+        Returns:
+            What the handleEvent of the widget under the mouse or in focus returned
+
+        """
+        for handler in self.handlers.get(event.type, ()):
+            handler(event)
+
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            target = self.widgetAt(event.pos)
+            if self.focus is not None and self.focus is not target:
+                self.focus.handleEvent(event)
+            self.focus = target
+        else:
+            target = self.focus
+
+        if target is None:
+            return None
+        return target.handleEvent(event)
+
+
 if __name__ == "__main__":
     pygame.init()
     screen = pygame.display.set_mode((200, 200))
@@ -0,0 +1,298 @@
+import bisect
+import operator
+import time
+from gameboard import BoardClass
+
+# The rating of a (rating, player id) entry of a sorted bucket
+_rating = operator.itemgetter(0)
+
+
+class EloRatings:
+    """Elo ratings for players, keyed by user name
+
+    Attributes:
+        k_factor: how much a single game can move a rating
+        initial_rating: the rating of a player that hasn't played yet
+        ratings: the rating of every player that has played
+
+    """
+    def __init__(self, k_factor: float = 32, initial_rating: float = 1200) -> None:
+        """Initializes the ratings
+
+        Args:
+            k_factor: how much a single game can move a rating
+            initial_rating: the rating of a player that hasn't played yet
+
+        """
+        self.k_factor = k_factor
+        self.initial_rating = initial_rating
+        self.ratings = {}
+
+    def getRating(self, name: str) -> float:
+        """Get a player's rating
+
+        Args:
+            name: the player's user name
+
+        Returns:
+            the player's rating
+        """
+        return self.ratings.get(name, self.initial_rating)
+
+    def expectedScore(self, name: str, other_name: str) -> float:
+        """Get the score name is expected to get against other_name
+
+        Args:
+            name: the player's user name
+            other_name: the other player's user name
+
+        Returns:
+            the expected score, between 0 and 1
+        """
+        difference = self.getRating(other_name) - self.getRating(name)
+        return 1 / (1 + 10 ** (difference / 400))
+
+    def updateRatings(self, name: str, other_name: str, score: float) -> None:
+        """Updates both players' ratings after a game
+
+        Args:
+            name: the player's user name
+            other_name: the other player's user name
+            score: the player's score, 1 for a win, 0.5 for a tie and 0 for a loss
+
+        """
+        change = self.k_factor * (score - self.expectedScore(name, other_name))
+        self.ratings[name] = self.getRating(name) + change
+        self.ratings[other_name] = self.getRating(other_name) - change
+
+    def recordResult(self, board: BoardClass) -> None:
+        """Updates the ratings from a finished game
+
+        Args:
+            board: the board of the finished game
+
+        """
+        result = board.getResult()
+        if result == 'You have won':
+            score = 1
+        elif result == 'You have lost':
+            score = 0
+        elif result == 'Tie':
+            score = 0.5
+        else:
+            raise ValueError("The game has no result")
+        self.updateRatings(board.getPlayerName(), board.getOtherPlayerName(), score)
+
+
+class MatchmakingQueue:
+    """A queue that pairs waiting players with similar ratings
+
+    Players are kept in rating buckets of bucket_width, and the keys of the
+    non empty buckets are kept sorted, so finding an opponent is a binary
+    search plus a look at the few buckets inside the tolerance window
+    instead of a scan of the whole queue. Every bucket is also kept sorted
+    by rating, so the buckets at the edges of the window are cut down to
+    the players inside it with a binary search too. The window starts at
+    base_tolerance and widens by widen_rate for every second a player has
+    been waiting, up to max_tolerance.
+
+    Attributes:
+        bucket_width: the rating range covered by one bucket
+        base_tolerance: the largest rating difference allowed right away
+        widen_rate: how much the tolerance grows per second of waiting
+        max_tolerance: the largest rating difference ever allowed
+        buckets: the waiting players in every bucket, oldest first
+        sorted_buckets: the ratings and waiting players in every bucket, lowest rating first
+        bucket_keys: the sorted keys of the non empty buckets
+        waiting: the rating and joining time of every waiting player, oldest first
+
+    """
+    def __init__(self,
+                 bucket_width: float = 25,
+                 base_tolerance: float = 50,
+                 widen_rate: float = 10,
+                 max_tolerance: float = 400) -> None:
+        """Initializes the queue
+
+        Args:
+            bucket_width: the rating range covered by one bucket
+            base_tolerance: the largest rating difference allowed right away
+            widen_rate: how much the tolerance grows per second of waiting
+            max_tolerance: the largest rating difference ever allowed
+
+        """
+        self.bucket_width = bucket_width
+        self.base_tolerance = base_tolerance
+        self.widen_rate = widen_rate
+        self.max_tolerance = max_tolerance
+        self.buckets = {}
+        self.sorted_buckets = {}
+        self.bucket_keys = []
+        self.waiting = {}
+
+    def __len__(self) -> int:
+        """Returns the number of waiting players"""
+        return len(self.waiting)
+
+    def __contains__(self, player_id: str) -> bool:
+        """Returns if the player is waiting"""
+        return player_id in self.waiting
+
+    def _bucketOf(self, rating: float) -> int:
+        """Returns the key of the bucket rating falls in"""
+        return int(rating // self.bucket_width)
+
+    def add(self, player_id: str, rating: float, now: float | None = None) -> None:
+        """Adds a player to the queue
+
+        Args:
+            player_id: the player to add
+            rating: the player's rating
+            now: the current time.monotonic() time
+
+        """
+        if player_id in self.waiting:
+            raise ValueError(player_id + " is already waiting")
+        if now is None:
+            now = time.monotonic()
+
+        self.waiting[player_id] = (rating, now)
+        key = self._bucketOf(rating)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = {}
+            self.sorted_buckets[key] = []
+            bisect.insort(self.bucket_keys, key)
+        bucket[player_id] = rating
+        bisect.insort(self.sorted_buckets[key], (rating, player_id))
+
+    def remove(self, player_id: str) -> bool:
+        """Removes a player from the queue
+
+        Args:
+            player_id: the player to remove
+
+        Returns:
+            A bool value indicating if the player was waiting
+        """
+        entry = self.waiting.pop(player_id, None)
+        if entry is None:
+            return False
+
+        key = self._bucketOf(entry[0])
+        bucket = self.buckets[key]
+        del bucket[player_id]
+        sorted_bucket = self.sorted_buckets[key]
+        del sorted_bucket[bisect.bisect_left(sorted_bucket, (entry[0], player_id))]
+        if not bucket:
+            del self.buckets[key]
+            del self.sorted_buckets[key]
+            del self.bucket_keys[bisect.bisect_left(self.bucket_keys, key)]
+        return True
+
+    def tolerance(self, player_id: str, now: float | None = None) -> float:
+        """Get the largest rating difference the player accepts right now
+
+        Args:
+            player_id: the waiting player
+            now: the current time.monotonic() time
+
+        Returns:
+            the tolerance
+        """
+        if now is None:
+            now = time.monotonic()
+        waited = max(0, now - self.waiting[player_id][1])
+        return min(self.base_tolerance + self.widen_rate * waited, self.max_tolerance)
+
+    def findMatch(self, player_id: str, now: float | None = None) -> (str | None):
+        """Finds an opponent for a waiting player
+
+        The closest bucket is tried first. The longest waiting player is
+        picked from a bucket that is entirely inside the tolerance window,
+        and the player with the closest rating from a bucket at its edge.
+        When an opponent is found both players leave the queue.
+
+        Args:
+            player_id: the waiting player
+            now: the current time.monotonic() time
+
+        Returns:
+            The opponent, or None if nobody is inside the tolerance window
+        """
+        rating = self.waiting[player_id][0]
+        tolerance = self.tolerance(player_id, now)
+        own_key = self._bucketOf(rating)
+        lo = bisect.bisect_left(self.bucket_keys, self._bucketOf(rating - tolerance))
+        hi = bisect.bisect_right(self.bucket_keys, self._bucketOf(rating + tolerance))
+
+        # Walk outwards from the player's own bucket, nearest bucket first
+        right = bisect.bisect_left(self.bucket_keys, own_key, lo, hi)
+        left = right - 1
+        while left >= lo or right < hi:
+            if right >= hi or (left >= lo and own_key - self.bucket_keys[left] <= self.bucket_keys[right] - own_key):
+                key = self.bucket_keys[left]
+                left -= 1
+            else:
+                key = self.bucket_keys[right]
+                right += 1
+
+            other_id = self._pickFrom(key, player_id, rating, tolerance)
+            if other_id is not None:
+                self.remove(player_id)
+                self.remove(other_id)
+                return other_id
+
+        return None
+
+    def _pickFrom(self, key: int, player_id: str, rating: float, tolerance: float) -> (str | None):
+        """Picks an opponent from one bucket without looking at players outside the window
+
+        Args:
+            key: the key of the bucket
+            player_id: the waiting player
+            rating: the waiting player's rating
+            tolerance: the largest rating difference allowed
+
+        Returns:
+            The opponent, or None if nobody in the bucket is inside the window
+        """
+        sorted_bucket = self.sorted_buckets[key]
+        first = bisect.bisect_left(sorted_bucket, rating - tolerance, key=_rating)
+        last = bisect.bisect_right(sorted_bucket, rating + tolerance, key=_rating)
+        if first == 0 and last == len(sorted_bucket):
+            # The whole bucket is inside the window, pick the longest waiting player
+            candidates = iter(self.buckets[key])
+            other_id = next(candidates)
+            if other_id == player_id:
+                other_id = next(candidates, None)
+            return other_id
+
+        # Only part of the bucket is inside the window, pick the closest rating next to the player's own
+        position = bisect.bisect_left(sorted_bucket, rating, first, last, key=_rating)
+        best = None
+        for i in range(max(first, position - 1), min(last, position + 2)):
+            other_rating, other_id = sorted_bucket[i]
+            if other_id != player_id and (best is None or abs(other_rating - rating) < abs(best[0] - rating)):
+                best = sorted_bucket[i]
+        return None if best is None else best[1]
+
+    def pairAll(self, now: float | None = None) -> list[tuple[str, str]]:
+        """Pairs as many waiting players as possible, longest waiting first
+
+        Args:
+            now: the current time.monotonic() time
+
+        Returns:
+            The pairs of players that were matched
+        """
+        if now is None:
+            now = time.monotonic()
+
+        pairs = []
+        for player_id in list(self.waiting):
+            if player_id in self.waiting:
+                other_id = self.findMatch(player_id, now)
+                if other_id is not None:
+                    pairs.append((player_id, other_id))
+        return pairs
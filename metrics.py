@@ -0,0 +1,332 @@
+import http.server
+import threading
+
+
+class Metric:
+    """A metric that every thread updates in its own shard
+
+    Each thread only ever writes to its own shard, a dict from label values
+    to the thread's share of the metric, so updates don't take a lock. The
+    shards are combined when the metric is collected.
+
+    Attributes:
+        name: the name of the metric
+        help: the description of the metric
+        labelnames: the names of the labels of the metric
+        shards: the shard of every thread that updated the metric, by thread id
+        lock: only held while a thread adds its shard
+
+    """
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()) -> None:
+        """Initializes the metric
+
+        Args:
+            name: the name of the metric
+            help: the description of the metric
+            labelnames: the names of the labels of the metric
+
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.shards = {}
+        self.lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        """Returns the shard of the current thread"""
+        shard = self.shards.get(threading.get_ident())
+        if shard is None:
+            with self.lock:
+                shard = self.shards.setdefault(threading.get_ident(), {})
+        return shard
+
+    def _labelText(self, labels: tuple, extra: str = '') -> str:
+        """Returns the labels in the Prometheus text format"""
+        pairs = ['{0}="{1}"'.format(name, value) for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(pairs) + '}'
+
+    def collect(self) -> dict:
+        """Combines the shards of every thread
+
+        Returns:
+            The value of the metric for every set of label values
+        """
+        totals = {}
+        for shard in list(self.shards.values()):
+            for labels, value in shard.copy().items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> str:
+        """Returns the metric in the Prometheus text format"""
+        lines = ['# HELP {0} {1}'.format(self.name, self.help), '# TYPE {0} {1}'.format(self.name, self.type)]
+        for labels, value in sorted(self.collect().items()):
+            lines.append('{0}{1} {2}'.format(self.name, self._labelText(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, labels: tuple = ()) -> None:
+        """Adds amount to the counter
+
+        Args:
+            amount: how much to add
+            labels: the label values
+
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down
+
+    inc and dec are sharded per thread like a counter. Values passed to set
+    replace the whole value, so they are kept in one slot shared by every
+    thread instead, and the last one set wins.
+
+    Attributes:
+        values: the values passed to set, by label values
+
+    """
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()) -> None:
+        """Initializes the gauge
+
+        Args:
+            name: the name of the metric
+            help: the description of the metric
+            labelnames: the names of the labels of the metric
+
+        """
+        super().__init__(name, help, labelnames)
+        self.values = {}
+
+    def inc(self, amount: float = 1, labels: tuple = ()) -> None:
+        """Adds amount to the gauge
+
+        Args:
+            amount: how much to add
+            labels: the label values
+
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, labels: tuple = ()) -> None:
+        """Subtracts amount from the gauge
+
+        Args:
+            amount: how much to subtract
+            labels: the label values
+
+        """
+        self.inc(-amount, labels)
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        """Sets the gauge to value
+
+        Any thread can set the gauge. Label values that are set aren't
+        meant to be moved with inc and dec as well.
+
+        Args:
+            value: the new value
+            labels: the label values
+
+        """
+        self.values[labels] = value
+
+    def collect(self) -> dict:
+        """Combines the shards of every thread with the values that were set
+
+        Returns:
+            The value of the gauge for every set of label values
+        """
+        totals = super().collect()
+        totals.update(self.values.copy())
+        return totals
+
+
+class Histogram(Metric):
+    """Counts observations in buckets
+
+    Attributes:
+        buckets: the upper bounds of the buckets, in increasing order
+
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: tuple, labelnames: tuple = ()) -> None:
+        """Initializes the histogram
+
+        Args:
+            name: the name of the metric
+            help: the description of the metric
+            buckets: the upper bounds of the buckets, in increasing order
+            labelnames: the names of the labels of the metric
+
+        """
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        """Records an observation
+
+        Args:
+            value: the value observed
+            labels: the label values
+
+        """
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            # One count per bucket, then the +Inf count and the sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 2)
+        for i in range(len(self.buckets)):
+            if value <= self.buckets[i]:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+    def collect(self) -> dict:
+        """Combines the shards of every thread
+
+        Returns:
+            The bucket counts, +Inf count and sum for every set of label values
+        """
+        totals = {}
+        for shard in list(self.shards.values()):
+            for labels, counts in shard.copy().items():
+                total = totals.setdefault(labels, [0] * (len(self.buckets) + 2))
+                for i in range(len(counts)):
+                    total[i] += counts[i]
+        return totals
+
+    def render(self) -> str:
+        """Returns the histogram in the Prometheus text format"""
+        lines = ['# HELP {0} {1}'.format(self.name, self.help), '# TYPE {0} histogram'.format(self.name)]
+        for labels, counts in sorted(self.collect().items()):
+            cumulative = 0
+            for i in range(len(self.buckets)):
+                cumulative += counts[i]
+                le = 'le="{0}"'.format(self.buckets[i])
+                lines.append('{0}_bucket{1} {2}'.format(self.name, self._labelText(labels, le), cumulative))
+            cumulative += counts[len(self.buckets)]
+            lines.append('{0}_bucket{1} {2}'.format(self.name, self._labelText(labels, 'le="+Inf"'), cumulative))
+            lines.append('{0}_sum{1} {2}'.format(self.name, self._labelText(labels), counts[-1]))
+            lines.append('{0}_count{1} {2}'.format(self.name, self._labelText(labels), cumulative))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """A set of metrics that are exposed together
+
+    Attributes:
+        metrics: the registered metrics, in the order they were added
+
+    """
+    def __init__(self) -> None:
+        """Initializes an empty registry"""
+        self.metrics = []
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        """Creates and registers a counter"""
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        """Creates and registers a gauge"""
+        metric = Gauge(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: tuple, labelnames: tuple = ()) -> Histogram:
+        """Creates and registers a histogram"""
+        metric = Histogram(name, help, buckets, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format"""
+        return ''.join(metric.render() for metric in self.metrics)
+
+
+REGISTRY = MetricsRegistry()
+
+ACTIVE_CONNECTIONS = REGISTRY.gauge('ttt_active_connections', 'Open connections to other players')
+ACTIVE_GAMES = REGISTRY.gauge('ttt_active_games', 'Games being played')
+GAMES_COMPLETED = REGISTRY.counter('ttt_games_completed_total', 'Finished games by result for the board owner', ('result',))
+MOVES = REGISTRY.counter('ttt_moves_total', 'Moves made, rate() gives moves per second')
+SENT_BYTES = REGISTRY.counter('ttt_sent_bytes_total', 'Bytes sent to other players')
+RECEIVED_BYTES = REGISTRY.counter('ttt_received_bytes_total', 'Bytes received from other players')
+EVENT_LOOP_LAG = REGISTRY.gauge('ttt_event_loop_lag_seconds', 'Time the last pass of the game loop spent away from the network')
+MOVE_LATENCY = REGISTRY.histogram('ttt_move_latency_seconds', 'Time from asking a player for a move to getting it',
+                                  (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60))
+
+# The result label of GAMES_COMPLETED for every BoardClass result
+RESULT_LABELS = {'You have won': 'win', 'You have lost': 'loss', 'Tie': 'tie'}
+
+
+class MetricsServer:
+    """A local HTTP server that exposes a registry at /metrics
+
+    Attributes:
+        registry: the metrics to expose
+        server: the HTTP server
+        thread: the thread the server runs on
+
+    """
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: MetricsRegistry = REGISTRY) -> None:
+        """Initializes the server
+
+        Args:
+            port: the port to listen on, 0 to pick a free one
+            host: the address to listen on
+            registry: the metrics to expose
+
+        """
+        self.registry = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def getPort(self) -> int:
+        """Returns the port the server listens on"""
+        return self.server.server_address[1]
+
+    def start(self) -> None:
+        """Starts serving in the background"""
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stops serving and closes the socket"""
+        self.server.shutdown()
+        self.server.server_close()
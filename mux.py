@@ -0,0 +1,378 @@
+import collections
+import select
+import socket
+import struct
+import time
+from gameboard import BoardClass
+from connection import PeerConnection, PeerTimeoutError, Timeouts, IdleReaper
+from players import Player, GameDriver, InvalidMoveError
+from metrics import RECEIVED_BYTES, EVENT_LOOP_LAG
+from pools import BOARD_POOL, QUEUE_POOL
+from timers import TimerHeap
+from checkpoint import CheckpointStore, trackDriver
+
+# Every frame starts with the game id, the kind of message and the payload length
+HEADER = struct.Struct('!IBH')
+
+# Kinds of messages
+START = 1       # Opens a game. Payload: the sender's move, 'x' or 'o', followed by the sender's name
+MOVE = 2        # Payload: the row and column as two ascii digits, like the one game protocol
+CONTROL = 3     # Payload: 'Play Again' or 'Fun Times', like the one game protocol
+END = 4         # Closes a game. No payload
+HEARTBEAT = 5   # Sent on game 0 when there is nothing else to send. No payload
+
+
+class MuxConnection(PeerConnection):
+    """A connection that carries many games at once
+
+    Messages are framed with the id of the game they belong to. Frames are
+    only queued when they are sent and flush writes every queued frame with
+    a single sendall, so the moves of all the games played in one pass go
+    out together. pump reads everything that has arrived and sorts the
+    frames into one inbox per game.
+
+    A game opened without a board gets one from BOARD_POOL, and the board
+    goes back to the pool when we close the game, so read its result
+    before, e.g. in the driver's on_finish. runGames then takes the board
+    away from the game's driver, so a late read fails instead of seeing a
+    reset board or another game's. A board whose game the other side
+    ended is left to the driver still holding it.
+
+    Attributes:
+        games: the board of every open game, by game id
+        inboxes: the received messages of every open game, by game id
+        pooled: the ids of the open games whose boards came from BOARD_POOL
+        started: the ids, moves and names of games the other side opened and that weren't accepted yet
+        outgoing: the frames waiting to be flushed
+        recv_buffer: the bytes received that don't make a whole frame yet
+
+    """
+    def __init__(self, sock: socket.socket, timeouts: Timeouts | None = None) -> None:
+        """Initializes the connection
+
+        Args:
+            sock: the socket connected to the other side
+            timeouts: the timeouts of the connection, the defaults if None
+
+        """
+        super().__init__(sock, timeouts)
+        self.games = {}
+        self.inboxes = {}
+        self.pooled = set()
+        self.started = collections.deque()
+        self.outgoing = []
+        self.recv_buffer = bytearray()
+
+    def getBoard(self, game_id: int) -> BoardClass:
+        """Get the board of a game
+
+        Args:
+            game_id: the id of the game
+
+        Returns:
+            the board of the game
+        """
+        return self.games[game_id]
+
+    def openGame(self, game_id: int, board: BoardClass | None = None, move: str | None = None) -> BoardClass:
+        """Opens a game on the connection
+
+        Args:
+            game_id: the id of the game, must not be 0 or already open
+            board: the board of the game, or None to take one from BOARD_POOL
+            move: our move, either 'x' or 'o'. If given, the other side is told about the game
+
+        Returns:
+            The board of the game
+        """
+        if game_id == 0 or game_id in self.games:
+            raise ValueError("Game id {0} is not available".format(game_id))
+        if board is None:
+            board = BOARD_POOL.acquire()
+            self.pooled.add(game_id)
+        self.games[game_id] = board
+        # Messages may have arrived right behind the START of a game the other side opened
+        if game_id not in self.inboxes:
+            self.inboxes[game_id] = QUEUE_POOL.acquire()
+        if move is not None:
+            self.queue(game_id, START, (move + board.getPlayerName()).encode('utf-8'))
+        return board
+
+    def acceptGame(self) -> (tuple[int, str, str] | None):
+        """Get a game the other side opened
+
+        Returns:
+            The game id, the other side's move and the other side's name, or None
+        """
+        if not self.started:
+            return None
+        return self.started.popleft()
+
+    def closeGame(self, game_id: int, notify: bool = True, release: bool = True) -> bool:
+        """Closes a game and forgets its board and messages
+
+        Args:
+            game_id: the id of the game
+            notify: whether to tell the other side
+            release: whether a board taken from BOARD_POOL goes back to it
+
+        Returns:
+            A bool value indicating if the board went back to BOARD_POOL
+        """
+        released = False
+        inbox = self.inboxes.pop(game_id, None)
+        if inbox is not None:
+            QUEUE_POOL.release(inbox)
+        board = self.games.pop(game_id, None)
+        if board is not None:
+            if game_id in self.pooled:
+                self.pooled.discard(game_id)
+                if release:
+                    BOARD_POOL.release(board)
+                    released = True
+            if notify:
+                self.queue(game_id, END)
+        return released
+
+    def queue(self, game_id: int, kind: int, payload: bytes = b'') -> None:
+        """Queues a message to be sent on the next flush
+
+        Args:
+            game_id: the id of the game the message belongs to
+            kind: the kind of message
+            payload: the content of the message
+
+        """
+        self.outgoing.append(HEADER.pack(game_id, kind, len(payload)) + payload)
+
+    def flush(self) -> None:
+        """Sends every queued message in a single write"""
+        if self.outgoing:
+            data = b''.join(self.outgoing)
+            self.outgoing.clear()
+            self.send(data)
+
+    def heartbeat(self, now: float | None = None) -> None:
+        """Sends a heartbeat frame if nothing was sent for heartbeat_interval
+
+        Args:
+            now: the current time.monotonic() time
+
+        """
+        if now is None:
+            now = time.monotonic()
+        if now - self.last_send >= self.timeouts.heartbeat_interval:
+            self.queue(0, HEARTBEAT)
+            self.flush()
+
+    def pump(self, timeout: float = 0.0) -> int:
+        """Reads everything that has arrived and sorts it into the inboxes
+
+        Args:
+            timeout: how long to wait for data to arrive
+
+        Returns:
+            The number of frames received
+
+        Raises:
+            ConnectionError: the other side closed the connection
+            PeerTimeoutError: the other side has been silent for too long
+        """
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            if self.isIdle():
+                raise PeerTimeoutError("No response from the other side")
+            return 0
+
+        data = self.sock.recv(65536)
+        if data == b'':
+            raise ConnectionError("The other side disconnected")
+        self.last_recv = time.monotonic()
+        RECEIVED_BYTES.inc(len(data))
+        self.recv_buffer += data
+
+        # Split off every complete frame
+        count = 0
+        offset = 0
+        view = memoryview(self.recv_buffer)
+        while len(view) - offset >= HEADER.size:
+            game_id, kind, length = HEADER.unpack_from(view, offset)
+            end = offset + HEADER.size + length
+            if end > len(view):
+                break
+            payload = bytes(view[offset + HEADER.size:end])
+            offset = end
+            count += 1
+
+            if kind == START:
+                text = payload.decode('utf-8')
+                self.started.append((game_id, text[0], text[1:]))
+                if game_id not in self.inboxes:
+                    self.inboxes[game_id] = QUEUE_POOL.acquire()
+            elif kind == END:
+                # The driver of the game still holds the board and forfeits on it
+                self.closeGame(game_id, False, False)
+            elif kind != HEARTBEAT and game_id in self.inboxes:
+                self.inboxes[game_id].append((kind, payload))
+        view.release()
+        del self.recv_buffer[:offset]
+        return count
+
+    def nextMessage(self, game_id: int, kind: int) -> (bytes | None):
+        """Get the next received message of a game if it is of the given kind
+
+        Args:
+            game_id: the id of the game
+            kind: the kind of message wanted
+
+        Returns:
+            The payload of the message, or None
+        """
+        inbox = self.inboxes.get(game_id)
+        if not inbox or inbox[0][0] != kind:
+            return None
+        return inbox.popleft()[1]
+
+
+class MuxRemotePlayer(Player):
+    """A player on the other end of a multiplexed connection
+
+    The player never reads from the socket itself. Whoever runs the games
+    pumps the connection once per pass and flushes it afterwards.
+
+    Attributes:
+        mux: the connection the game is played over
+        game_id: the id of the game
+
+    """
+    def __init__(self, name: str, move: str, mux: MuxConnection, game_id: int) -> None:
+        """Initializes the remote player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+            mux: the connection the game is played over
+            game_id: the id of the game
+
+        """
+        super().__init__(name, move)
+        self.mux = mux
+        self.game_id = game_id
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Returns the move the other side sent, if it arrived
+
+        Raises:
+            ConnectionError: the other side closed the game
+            InvalidMoveError: the other side sent something other than two digits
+        """
+        if self.game_id not in self.mux.games:
+            raise ConnectionError(self.name + " closed the game")
+
+        payload = self.mux.nextMessage(self.game_id, MOVE)
+        if payload is None:
+            return None
+        if len(payload) != 2 or not payload.isdigit():
+            raise InvalidMoveError("{0} sent {1!r}, which isn't a move".format(self.name, payload))
+        return (int(payload[0:1]), int(payload[1:2]))
+
+    def notifyMove(self, index: tuple[int, int], move: str) -> None:
+        """Queues the local player's move for the other side"""
+        self.mux.queue(self.game_id, MOVE, (str(index[0]) + str(index[1])).encode('ascii'))
+
+
+def _remoteOf(driver: GameDriver) -> MuxRemotePlayer:
+    """Returns the player of a game that is on the other side of the connection"""
+    return [player for player in driver.players if isinstance(player, MuxRemotePlayer)][0]
+
+
+def runGames(mux: MuxConnection,
+             drivers: list[GameDriver],
+             checkpoints: CheckpointStore | None = None,
+             slots: dict[int, int] | None = None) -> None:
+    """Plays many games over one connection until all of them are over
+
+    Every pass reads the connection once, runs the expired timers, lets
+    every game that isn't over take a step and then sends all the
+    resulting moves in one write. The read doesn't wait while a local
+    player has a move to make. A game is closed as soon as it is over, and
+    the other side is only told when it ended by a forfeit, since a
+    finished game ends on both sides with its last move. A driver whose
+    board came from BOARD_POOL has its board set to None when the board
+    goes back, so read the result in on_finish. The time a pass
+    spends away from the socket is reported as event loop lag. An
+    IdleReaper watches the connection, and if the other side goes silent
+    it forfeits every game still playing. If a checkpoint store is given,
+    every game is saved into it when it starts and after every move, with
+    the game id as its token, and its slot is freed when the game is over.
+
+    Drivers that were already resumed, e.g. with games restored from the
+    checkpoint store, carry on from their position instead of starting
+    over, and keep the slots they were restored from.
+
+    Args:
+        mux: the connection the games are played over
+        drivers: the drivers of the games, either not started yet or resumed
+        checkpoints: the store to checkpoint the games into, or None
+        slots: the slot of every restored game, by game id
+
+    """
+    for driver in drivers:
+        if not driver.active:
+            driver.start()
+        if checkpoints is not None:
+            game_id = _remoteOf(driver).game_id
+            slot = None if slots is None else slots.get(game_id)
+            trackDriver(checkpoints, driver, str(game_id).encode('ascii'), slot)
+    playing = list(drivers)
+
+    def closeDriver(driver: GameDriver, notify: bool) -> None:
+        # A board that went back to the pool is no longer the driver's
+        if mux.closeGame(_remoteOf(driver).game_id, notify):
+            driver.board = None
+
+    def forfeitAll(conn: PeerConnection) -> None:
+        # The connection is gone, the other side forfeits every game still playing
+        for driver in playing:
+            driver.forfeit(_remoteOf(driver))
+            closeDriver(driver, False)
+        for game_id in set(mux.games) | set(mux.inboxes):
+            mux.closeGame(game_id, False)
+        mux.close()
+
+    timers = TimerHeap()
+    reaper = IdleReaper(timers)
+    reaper.watch(mux, None, '', forfeitAll)
+    try:
+        mux.flush()
+    except OSError:
+        forfeitAll(mux)
+        return
+
+    while playing:
+        local_turn = any(not isinstance(driver.current(), MuxRemotePlayer) for driver in playing)
+        try:
+            mux.pump(0.0 if local_turn else 0.01)
+        except OSError:
+            forfeitAll(mux)
+            return
+        started = time.monotonic()
+        timers.runExpired(started)
+        if mux.closed:
+            return
+
+        still_playing = []
+        for driver in playing:
+            if driver.step():
+                closeDriver(driver, driver.forfeited is not None)
+            else:
+                still_playing.append(driver)
+        playing = still_playing
+        try:
+            mux.flush()
+            mux.heartbeat()
+        except OSError:
+            forfeitAll(mux)
+            return
+        EVENT_LOOP_LAG.set(time.monotonic() - started)
+    reaper.unwatch(mux)
@@ -1,11 +1,15 @@
 #Name: Yumeng Liu
 #ID: 84419467
 
+import os
 import socket
 import sys
 from gameboard import BoardClass
 import pygame
 from gamefunctions import *
+from connection import PeerConnection, Timeouts
+from ultimate import UltimateBoardClass
+from traffic import RecordingSocket
 
     
 def main() -> None:
@@ -20,7 +24,12 @@ def main() -> None:
     screen = pygame.display.set_mode((600, 800))
     pygame.display.set_caption("Player 1")
     p1_board = BoardClass()
+    timeouts = Timeouts()
     p1_s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    p1_s.settimeout(timeouts.read_timeout)
+    if os.environ.get('TTT_CAPTURE'):
+        # Record the session so traffic.py can replay it
+        p1_s = RecordingSocket(p1_s, os.environ['TTT_CAPTURE'], 'player1')
 
     while True:
         # Get host info from user
@@ -33,32 +42,49 @@ def main() -> None:
             p1_board.setPlayerName(name)
             p1_s.send(name.encode('ascii'))
             p1_board.setOtherPlayerName(p1_s.recv(1024).decode())
+            p1_conn = PeerConnection(p1_s, timeouts)
             break
         except Exception as e:
             # If connection fails, ask user to reconnect
             print(e)
             if not optionScreen(screen, 'Failed to connect. Try Again?'):
                 sys.exit(0)
+
+    try:
+        # Pick the game to play and tell player 2
+        ultimate = optionScreen(screen, 'Play ultimate tic-tac-toe?', p1_conn)
+        p1_conn.send(('u' if ultimate else 't').encode('ascii'))
+    except Exception as e:
+        # If the connection is broken before the game, end the program
+        print(e)
+        sys.exit(0)
+
+    if ultimate:
+        other_name = p1_board.getOtherPlayerName()
+        p1_board = UltimateBoardClass()
+        p1_board.setPlayerName(name)
+        p1_board.setOtherPlayerName(other_name)
+    grid = createGrid(screen, p1_board)
             
     while True:
         try:
             # Start a game
-            gameLoop(p1_board, p1_s, screen, False, 'x')
+            gameLoop(p1_board, p1_conn, screen, False, 'x', grid)
             
             # When the game is over, ask player 1 to play again
-            if optionScreen(screen, 'Game over. Play Again?') == False:
-                p1_s.send('Fun Times'.encode('ascii'))
+            if optionScreen(screen, 'Game over. Play Again?', p1_conn) == False:
+                p1_conn.send('Fun Times'.encode('ascii'))
                 resultScreen(screen, p1_board)
                 break
 
-            p1_s.send('Play Again'.encode('ascii'))
+            p1_conn.send('Play Again'.encode('ascii'))
 
         except Exception as e:
             # If the connection is broken during the game, end the program
             print(e)
             break
 
-    p1_s.close()
+    p1_conn.close()
 
 
 
@@ -1,11 +1,15 @@
 #Name: Yumeng Liu
 #ID: 84419467
 
+import os
 import socket
 import sys
 from gameboard import BoardClass
 import pygame
 from gamefunctions import *
+from connection import PeerConnection, Timeouts
+from ultimate import UltimateBoardClass
+from traffic import RecordingSocket
 
 
 def main() -> None:
@@ -22,6 +26,7 @@ def main() -> None:
     pygame.display.set_caption("Player 2")
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     p2_board = BoardClass()
+    timeouts = Timeouts()
     p2_s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     while True:
         # Get host info from user
@@ -33,12 +38,17 @@ def main() -> None:
 
             # Waits for player 1 to conenct
             p2_s = serverEstablishedScreen(screen, server_socket)
+            p2_s.settimeout(timeouts.read_timeout)
+            if os.environ.get('TTT_CAPTURE'):
+                # Record the session so traffic.py can replay it
+                p2_s = RecordingSocket(p2_s, os.environ['TTT_CAPTURE'], 'player2')
 
             # Exchange user name
             p2_board.setOtherPlayerName(p2_s.recv(1024).decode())
             p2_board.setPlayerName(name)
             
             p2_s.send(name.encode('ascii'))
+            p2_conn = PeerConnection(p2_s, timeouts)
             break
         
         except Exception as e:
@@ -48,13 +58,29 @@ def main() -> None:
                 pygame.quit()
                 sys.exit(0)
 
+    try:
+        # Wait for player 1 to pick the game to play
+        ultimate = variantScreen(screen, p2_conn, p2_board)
+    except Exception as e:
+        # If the connection is broken before the game, end the program
+        print(e)
+        pygame.quit()
+        sys.exit(0)
+
+    if ultimate:
+        other_name = p2_board.getOtherPlayerName()
+        p2_board = UltimateBoardClass()
+        p2_board.setPlayerName(name)
+        p2_board.setOtherPlayerName(other_name)
+    grid = createGrid(screen, p2_board)
+
     while True:
         try:
             # Start a game
-            gameLoop(p2_board, p2_s, screen, True, 'o')
+            gameLoop(p2_board, p2_conn, screen, True, 'o', grid)
 
             # When the game is over, wait for player 1's response
-            postGameScreen(screen, p2_s, p2_board)
+            postGameScreen(screen, p2_conn, p2_board)
 
         except Exception as e:
             # If the connection is broken during the game, end the program
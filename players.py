@@ -0,0 +1,373 @@
+import random
+import time
+from typing import Callable
+from gameboard import BoardClass
+from connection import PeerConnection
+from metrics import ACTIVE_GAMES, GAMES_COMPLETED, MOVES, MOVE_LATENCY, RESULT_LABELS
+
+
+class InvalidMoveError(ValueError):
+    """Raised by pollMove when a player sent something that isn't a move"""
+    pass
+
+
+class Player:
+    """Something that can make moves in a game
+
+    A player is asked for a move with requestMove and is then polled with
+    pollMove until it returns one. pollMove must never block, so the same
+    driver can run mouse, network, engine and replay players side by side.
+
+    Attributes:
+        name: the player's user name
+        move: the player's move, either 'x' or 'o'
+        deadline: the time.monotonic() time the pending move is due by, or None
+
+    """
+    def __init__(self, name: str, move: str) -> None:
+        """Initializes the player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+
+        """
+        self.name = name
+        self.move = move
+        self.deadline = None
+
+    def requestMove(self, board: BoardClass, deadline: float | None = None) -> None:
+        """Asks the player for its next move
+
+        Args:
+            board: the board the move will be made on
+            deadline: the time.monotonic() time the move is due by, or None
+
+        """
+        self.deadline = deadline
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Checks if the requested move is ready
+
+        Returns:
+            The index of the move, or None if the player hasn't decided yet
+
+        """
+        return None
+
+    def notifyMove(self, index: tuple[int, int], move: str) -> None:
+        """Tells the player about the move the other player made
+
+        Args:
+            index: the location of the move
+            move: the move that was made, either 'x' or 'o'
+
+        """
+        pass
+
+    def close(self) -> None:
+        """Releases anything the player holds"""
+        pass
+
+
+class RemotePlayer(Player):
+    """A player on the other end of a connection
+
+    Moves are exchanged as two ascii digits, the row followed by the column.
+
+    Attributes:
+        conn: the connection to the other player
+        buffer: the bytes of the move that have been received so far
+        poll_timeout: how long pollMove may wait for data, 0 to never wait
+
+    """
+    def __init__(self, name: str, move: str, conn: PeerConnection, poll_timeout: float = 0.0) -> None:
+        """Initializes the remote player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+            conn: the connection to the other player
+            poll_timeout: how long pollMove may wait for data, 0 to never wait
+
+        """
+        super().__init__(name, move)
+        self.conn = conn
+        self.buffer = b''
+        self.poll_timeout = poll_timeout
+
+    def requestMove(self, board: BoardClass, deadline: float | None = None) -> None:
+        """Starts waiting for the other player's move"""
+        super().requestMove(board, deadline)
+        self.buffer = b''
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Reads whatever part of the move has arrived without blocking
+
+        Returns:
+            The index of the move once both digits arrived, otherwise None
+
+        Raises:
+            InvalidMoveError: the other player sent something other than two digits
+        """
+        self.buffer += self.conn.poll(2 - len(self.buffer), self.poll_timeout)
+        if len(self.buffer) < 2:
+            return None
+
+        data = self.buffer
+        self.buffer = b''
+        if not data.isdigit():
+            raise InvalidMoveError("{0} sent {1!r}, which isn't a move".format(self.name, data))
+        return (int(data[0:1]), int(data[1:2]))
+
+    def notifyMove(self, index: tuple[int, int], move: str) -> None:
+        """Sends the local player's move to the other player"""
+        self.conn.send((str(index[0]) + str(index[1])).encode('ascii'))
+
+    def close(self) -> None:
+        """Closes the connection"""
+        self.conn.close()
+
+
+class EnginePlayer(Player):
+    """A computer player
+
+    Attributes:
+        choose: the function that picks a move given the board
+        choice: the move picked for the pending request
+
+    """
+    def __init__(self, name: str, move: str, choose: Callable[[BoardClass], tuple[int, int]] | None = None) -> None:
+        """Initializes the engine player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+            choose: the function that picks a move, a random valid move by default
+
+        """
+        super().__init__(name, move)
+        self.choose = choose if choose is not None else randomMove
+        self.choice = None
+
+    def requestMove(self, board: BoardClass, deadline: float | None = None) -> None:
+        """Picks the next move right away"""
+        super().requestMove(board, deadline)
+        self.choice = self.choose(board)
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Returns the picked move"""
+        choice = self.choice
+        self.choice = None
+        return choice
+
+
+class ReplayPlayer(Player):
+    """A player that replays a recorded list of moves
+
+    Attributes:
+        moves: the moves to replay, in order
+        position: the index of the next move to replay
+
+    """
+    def __init__(self, name: str, move: str, moves: list[tuple[int, int]]) -> None:
+        """Initializes the replay player
+
+        Args:
+            name: the player's user name
+            move: the player's move, either 'x' or 'o'
+            moves: the moves to replay, in order
+
+        """
+        super().__init__(name, move)
+        self.moves = moves
+        self.position = 0
+
+    def pollMove(self) -> (tuple[int, int] | None):
+        """Returns the next recorded move"""
+        if self.position >= len(self.moves):
+            return None
+        self.position += 1
+        return self.moves[self.position - 1]
+
+
+def randomMove(board: BoardClass) -> tuple[int, int]:
+    """Picks a random valid move
+
+    Args:
+        board: the board to pick a move on
+
+    Returns:
+        The index of the move
+
+    """
+    return random.choice(board.legalMoves())
+
+
+class GameDriver:
+    """Runs one game between two players on a BoardClass
+
+    The first player in players makes the first move. The board keeps its
+    usual meaning: results are from the point of view of board.player_name.
+    A player that misses its deadline, whose connection fails or that makes
+    an invalid move forfeits.
+
+    Attributes:
+        board: the game board, or None once a host gave it back to a pool
+        players: the two players, in the order they move
+        move_time: how many seconds each player has to make a move, or None
+        on_move: called with the player and the index after every move, once its result is on the board
+        on_finish: called with the driver when the game is over, won, tied or forfeited
+        turn: the index in players of the player to move
+        moves: the number of moves made in the game
+        over: whether the game is over
+        forfeited: the player that forfeited the game, or None
+        active: whether a started game is counted in the active games metric
+        requested_at: the time.monotonic() time the pending move was asked for
+
+    """
+    def __init__(self,
+                 board: BoardClass,
+                 players: list[Player],
+                 move_time: float | None = None,
+                 on_move: Callable[[Player, tuple[int, int]], None] | None = None,
+                 on_finish: Callable[['GameDriver'], None] | None = None) -> None:
+        """Initializes the driver
+
+        Args:
+            board: the game board
+            players: the two players, in the order they move
+            move_time: how many seconds each player has to make a move, or None
+            on_move: called with the player and the index after every move, once its result is on the board
+            on_finish: called with the driver when the game is over, won, tied or forfeited
+
+        """
+        self.board = board
+        self.players = players
+        self.move_time = move_time
+        self.on_move = on_move
+        self.on_finish = on_finish
+        self.turn = 0
+        self.moves = 0
+        self.over = False
+        self.forfeited = None
+        self.active = False
+        self.requested_at = 0.0
+
+    def current(self) -> Player:
+        """Returns the player to move"""
+        return self.players[self.turn]
+
+    def start(self) -> None:
+        """Resets the board and asks the first player for a move"""
+        self.board.resetGameBoard()
+        self.resume(0)
+
+    def resume(self, moves: int) -> None:
+        """Continues a game that is already on the board
+
+        Used to pick up a game restored from a checkpoint
+
+        Args:
+            moves: the number of moves already made, which decides who is to move
+
+        """
+        if not self.active:
+            self.active = True
+            ACTIVE_GAMES.inc()
+        self.moves = moves
+        self.turn = moves % 2
+        self.over = False
+        self.forfeited = None
+        self._request()
+
+    def _request(self) -> None:
+        """Asks the player to move for a move"""
+        self.requested_at = time.monotonic()
+        deadline = None
+        if self.move_time is not None:
+            deadline = self.requested_at + self.move_time
+        self.current().requestMove(self.board, deadline)
+
+    def _finish(self) -> None:
+        """Marks the game as over, counts its result and calls on_finish"""
+        self.over = True
+        if self.active:
+            self.active = False
+            ACTIVE_GAMES.dec()
+            GAMES_COMPLETED.inc(1, (RESULT_LABELS.get(self.board.getResult(), 'unknown'),))
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+    def step(self) -> bool:
+        """Polls the player to move once and applies its move if it's ready
+
+        Returns:
+            A bool value indicating if the game is over
+
+        """
+        if self.over:
+            return True
+
+        player = self.current()
+        try:
+            index = player.pollMove()
+        except (OSError, InvalidMoveError):
+            self.forfeit(player)
+            return True
+
+        if index is None:
+            if player.deadline is not None and time.monotonic() > player.deadline:
+                self.forfeit(player)
+                return True
+            return False
+
+        if not self.board.isValidMove(index):
+            self.forfeit(player)
+            return True
+
+        MOVES.inc()
+        MOVE_LATENCY.observe(time.monotonic() - self.requested_at)
+        self.board.updateGameBoard(index, player.move, player.name)
+        self.moves += 1
+        other = self.players[1 - self.turn]
+        try:
+            other.notifyMove(index, player.move)
+        except OSError:
+            self.forfeit(other)
+            return True
+
+        # Check winning condition, end the game if the game is over
+        over = self.board.checkGameEnd()
+        if self.on_move is not None:
+            self.on_move(player, index)
+        if over:
+            self._finish()
+            return True
+
+        self.turn = 1 - self.turn
+        self._request()
+        return False
+
+    def forfeit(self, player: Player) -> None:
+        """Ends the game with player forfeiting
+
+        Args:
+            player: the player that forfeits
+
+        """
+        self.board.forfeitGame(player.name)
+        self.forfeited = player
+        self._finish()
+
+    def run(self, on_tick: Callable[['GameDriver'], None] | None = None) -> None:
+        """Plays the game until it is over
+
+        Args:
+            on_tick: called after every poll, e.g. to render and limit the framerate
+
+        """
+        self.start()
+        while not self.step():
+            if on_tick is not None:
+                on_tick(self)
@@ -0,0 +1,92 @@
+import collections
+import tracemalloc
+from typing import Callable
+from gameboard import BoardClass
+
+
+class ObjectPool:
+    """Keeps released objects to hand them out again instead of allocating new ones
+
+    Attributes:
+        factory: creates a new object when the pool is empty
+        reset: prepares a released object for its next use
+        max_size: the most objects kept, or None for no limit
+        free: the objects ready to be handed out
+
+    """
+    def __init__(self, factory: Callable, reset: Callable, max_size: int | None = None) -> None:
+        """Initializes an empty pool
+
+        Args:
+            factory: creates a new object when the pool is empty
+            reset: prepares a released object for its next use
+            max_size: the most objects kept, or None for no limit
+
+        """
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size
+        self.free = []
+
+    def __len__(self) -> int:
+        """Returns the number of objects ready to be handed out"""
+        return len(self.free)
+
+    def acquire(self):
+        """Get an object from the pool, or a new one if the pool is empty"""
+        if self.free:
+            return self.free.pop()
+        return self.factory()
+
+    def release(self, obj) -> None:
+        """Gives an object back to the pool
+
+        Args:
+            obj: an object that is no longer used
+
+        """
+        if self.max_size is None or len(self.free) < self.max_size:
+            self.reset(obj)
+            self.free.append(obj)
+
+
+# Boards are reset completely, names and scores included, when they are released.
+# MuxConnection takes boards for games opened without one and gives them back when they are closed.
+BOARD_POOL = ObjectPool(BoardClass, BoardClass.resetAll)
+
+# Message queues, e.g. the inboxes of the games on a multiplexed connection
+QUEUE_POOL = ObjectPool(collections.deque, collections.deque.clear)
+
+
+def measureFootprint(count: int = 100000, factory: Callable = BoardClass) -> float:
+    """Measures how much memory a game takes
+
+    Creates count games with names and a few moves, like games being
+    played, and measures the memory they take.
+
+    Args:
+        count: how many games to create
+        factory: creates a game
+
+    Returns:
+        The average number of bytes per game
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = []
+    for i in range(count):
+        game = factory()
+        game.setPlayerName('player')
+        game.setOtherPlayerName('opponent')
+        game.updateGameBoard((1, 1), 'x', 'player')
+        game.updateGameBoard((0, 2), 'o', 'opponent')
+        games.append(game)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Don't count the list holding the games
+    return (after - before - len(games) * 8) / count
+
+
+if __name__ == "__main__":
+    print("Bytes per game: {0:.0f}".format(measureFootprint()))
@@ -0,0 +1,146 @@
+import collections
+import io
+import os
+import tempfile
+import pygame
+import gui
+from gameboard import BoardClass
+from gamefunctions import drawGridLines
+
+# The board drawn by drawBoard fits in a square of this size
+BOARD_SIZE = 600
+
+
+def renderBoard(board: BoardClass, size: int = BOARD_SIZE) -> pygame.Surface:
+    """Draws a board on an off-screen surface
+
+    The board looks the same as in the game. Only plain surfaces are used,
+    so no window or display is needed.
+
+    Args:
+        board: the board to draw
+        size: the width and height of the picture
+
+    Returns:
+        The surface the board was drawn on
+
+    Raises:
+        ValueError: the board isn't a 3x3 board
+    """
+    if board.GRID_SIZE != 3:
+        raise ValueError("Only 3x3 boards can be drawn")
+    surface = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+    grid = gui.BlockGrid(surface, 10, 10, 193)
+    for i in range(3):
+        for j in range(3):
+            if board.board[i][j] == 'o':
+                grid.blocks[i][j].drawCircle()
+            elif board.board[i][j] == 'x':
+                grid.blocks[i][j].drawX()
+    grid.draw_me()
+    drawGridLines(surface, grid)
+
+    if size != BOARD_SIZE:
+        surface = pygame.transform.smoothscale(surface, (size, size))
+    return surface
+
+
+def encodeSurface(surface: pygame.Surface, fmt: str) -> bytes:
+    """Encodes a surface as an image
+
+    Args:
+        surface: the surface to encode
+        fmt: 'png' for a PNG file or 'rgb' for raw RGB pixels, row by row
+
+    Returns:
+        The encoded image
+    """
+    if fmt == 'rgb':
+        return pygame.image.tobytes(surface, 'RGB')
+    if fmt == 'png':
+        file = io.BytesIO()
+        pygame.image.save(surface, file, 'board.png')
+        return file.getvalue()
+    raise ValueError("Unknown image format " + fmt)
+
+
+class SnapshotCache:
+    """Pictures of boards, cached by position
+
+    Pictures are keyed by the position code of the board, the size and the
+    format, so every game that reaches a position shares its picture. The
+    most recently used pictures are kept in memory, and if a directory is
+    given every picture is also written there and read back after it was
+    evicted or the process restarted.
+
+    Attributes:
+        capacity: the most pictures kept in memory
+        directory: the directory of the on-disk tier, or None
+        entries: the pictures in memory, least recently used first
+        hits: the number of requests answered from memory
+        disk_hits: the number of requests answered from the directory
+        misses: the number of pictures that had to be drawn
+
+    """
+    def __init__(self, capacity: int = 8192, directory: str | None = None) -> None:
+        """Initializes the cache
+
+        Args:
+            capacity: the most pictures kept in memory
+            directory: the directory of the on-disk tier, or None
+
+        """
+        self.capacity = capacity
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: tuple[int, int, str]) -> str:
+        """Returns the file a picture is kept in on disk"""
+        return os.path.join(self.directory, '{0}-{1}.{2}'.format(*key))
+
+    def get(self, board: BoardClass, fmt: str = 'png', size: int = BOARD_SIZE) -> bytes:
+        """Get the picture of a board
+
+        Args:
+            board: the board
+            fmt: 'png' for a PNG file or 'rgb' for raw RGB pixels, row by row
+            size: the width and height of the picture
+
+        Returns:
+            The encoded picture
+
+        Raises:
+            ValueError: the board isn't a 3x3 board
+        """
+        if board.GRID_SIZE != 3:
+            raise ValueError("Only 3x3 boards can be drawn")
+        key = (board.getPositionCode(), size, fmt)
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), 'rb') as file:
+                data = file.read()
+            self.disk_hits += 1
+        else:
+            data = encodeSurface(renderBoard(board, size), fmt)
+            self.misses += 1
+            if self.directory is not None:
+                # Write to a temporary file first so readers never see half a picture
+                handle, temp_path = tempfile.mkstemp(dir=self.directory)
+                with os.fdopen(handle, 'wb') as file:
+                    file.write(data)
+                os.replace(temp_path, self._path(key))
+
+        self.entries[key] = data
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return data
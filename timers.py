@@ -0,0 +1,81 @@
+import heapq
+import itertools
+import time
+from typing import Callable
+
+
+class TimerHeap:
+    """Deadlines kept in a binary heap
+
+    Scheduling and cancelling are O(log n) and O(1), so a host can keep one
+    deadline per connection and only ever look at the ones that expired.
+    Cancelled timers stay in the heap until they reach the top.
+
+    Attributes:
+        heap: the scheduled timers as [deadline, sequence number, callback] lists
+        counter: gives timers with the same deadline a stable order
+
+    """
+    def __init__(self) -> None:
+        """Initializes an empty timer heap"""
+        self.heap = []
+        self.counter = itertools.count()
+
+    def __len__(self) -> int:
+        """Returns the number of scheduled timers, including cancelled ones"""
+        return len(self.heap)
+
+    def schedule(self, deadline: float, callback: Callable[[], None]) -> list:
+        """Schedules callback to run at deadline
+
+        Args:
+            deadline: the time.monotonic() time to run the callback at
+            callback: the function to run
+
+        Returns:
+            A handle that can be passed to cancel
+        """
+        timer = [deadline, next(self.counter), callback]
+        heapq.heappush(self.heap, timer)
+        return timer
+
+    def cancel(self, timer: list) -> None:
+        """Cancels a scheduled timer
+
+        Args:
+            timer: the handle returned by schedule
+
+        """
+        timer[2] = None
+
+    def nextDeadline(self) -> (float | None):
+        """Get the deadline of the next timer
+
+        Returns:
+            The earliest deadline, or None if nothing is scheduled
+        """
+        while self.heap and self.heap[0][2] is None:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return self.heap[0][0]
+
+    def runExpired(self, now: float | None = None) -> int:
+        """Runs every timer whose deadline has passed
+
+        Args:
+            now: the current time.monotonic() time
+
+        Returns:
+            The number of callbacks that were run
+        """
+        if now is None:
+            now = time.monotonic()
+
+        count = 0
+        while self.heap and self.heap[0][0] <= now:
+            callback = heapq.heappop(self.heap)[2]
+            if callback is not None:
+                callback()
+                count += 1
+        return count
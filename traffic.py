@@ -0,0 +1,220 @@
+import argparse
+import json
+import socket
+import time
+from connection import HEARTBEAT
+
+
+class RecordingSocket:
+    """A socket that writes everything sent and received to a capture file
+
+    The capture starts with a line naming the side that was recorded,
+    followed by one line per send or receive with the time since the first
+    of them, the direction ('out' or 'in') and the bytes in hex. Everything
+    else is passed on to the wrapped socket.
+
+    Attributes:
+        sock: the wrapped socket
+        file: the capture file
+        start: the time.monotonic() time of the first send or receive, or None
+
+    """
+    def __init__(self, sock: socket.socket, path: str, role: str) -> None:
+        """Starts recording a socket
+
+        Args:
+            sock: the socket to record
+            path: the capture file to write
+            role: the side being recorded, e.g. 'player1'
+
+        """
+        self.sock = sock
+        self.file = open(path, 'w')
+        self.file.write(json.dumps({'role': role}) + '\n')
+        self.start = None
+
+    def __getattr__(self, name: str):
+        """Passes everything that isn't recorded on to the socket"""
+        return getattr(self.sock, name)
+
+    def _record(self, direction: str, data: bytes) -> None:
+        """Writes one send or receive to the capture"""
+        now = time.monotonic()
+        if self.start is None:
+            self.start = now
+        self.file.write(json.dumps({'t': round(now - self.start, 6), 'dir': direction, 'data': data.hex()}) + '\n')
+        self.file.flush()
+
+    def send(self, data: bytes, *args) -> int:
+        """Sends data and records what was sent"""
+        count = self.sock.send(data, *args)
+        self._record('out', bytes(data[:count]))
+        return count
+
+    def sendall(self, data: bytes, *args) -> None:
+        """Sends all of data and records it"""
+        self.sock.sendall(data, *args)
+        self._record('out', bytes(data))
+
+    def recv(self, size: int, *args) -> bytes:
+        """Receives data and records what was received"""
+        data = self.sock.recv(size, *args)
+        if data:
+            self._record('in', data)
+        return data
+
+    def close(self) -> None:
+        """Closes the socket and the capture"""
+        self.sock.close()
+        if not self.file.closed:
+            self.file.close()
+
+
+def loadCapture(path: str) -> tuple[str, list[tuple[float, str, bytes]]]:
+    """Reads a capture file
+
+    Args:
+        path: the capture file
+
+    Returns:
+        The side that was recorded, and the time, direction and bytes of every send and receive
+    """
+    with open(path) as file:
+        role = json.loads(file.readline())['role']
+        events = []
+        for line in file:
+            record = json.loads(line)
+            events.append((record['t'], record['dir'], bytes.fromhex(record['data'])))
+    return (role, events)
+
+
+def replay(events: list[tuple[float, str, bytes]], sock: socket.socket, speed: float = 1.0, timeout: float = 10.0) -> dict:
+    """Plays the recorded side of a capture against a live peer
+
+    Recorded sends are sent again, at the recorded times divided by speed,
+    or as fast as possible if speed is 0. For every recorded receive the
+    same number of bytes is read from the peer, ignoring heartbeats, and
+    compared with what was recorded. If the peer stops answering for
+    timeout seconds or disconnects, e.g. because its session went another
+    way, the replay stops and every message still expected counts as a
+    mismatch.
+
+    Args:
+        events: the sends and receives of the capture
+        sock: the socket connected to the peer
+        speed: how many times faster than recorded to play, 0 for as fast as possible
+        timeout: how many seconds to wait for the peer before giving up
+
+    Returns:
+        The number of messages and bytes each way, the duration, the
+        messages per second, the wait for every received message, the
+        number of received messages that differ from the capture and why
+        the replay stopped early, or None if it didn't
+    """
+    report = {'sent': 0, 'received': 0, 'bytes_sent': 0, 'bytes_received': 0, 'mismatches': 0, 'waits': [],
+              'stopped': None}
+    sock.settimeout(timeout)
+    start = time.monotonic()
+    ready = start
+    for i in range(len(events)):
+        t, direction, data = events[i]
+        try:
+            if direction == 'out':
+                if speed > 0:
+                    time.sleep(max(0.0, start + t / speed - time.monotonic()))
+                sock.sendall(data)
+                ready = time.monotonic()
+                report['sent'] += 1
+                report['bytes_sent'] += len(data)
+                continue
+
+            expected = data.replace(HEARTBEAT, b'')
+            if not expected:
+                continue
+            received = b''
+            while len(received) < len(expected):
+                chunk = sock.recv(len(expected) - len(received))
+                if chunk == b'':
+                    raise ConnectionError("The peer disconnected before the capture ended")
+                received += chunk.replace(HEARTBEAT, b'')
+        except OSError as e:
+            # The session went another way, count what never arrived
+            report['stopped'] = str(e) or type(e).__name__
+            report['mismatches'] += sum(1 for _, direction, data in events[i:]
+                                        if direction == 'in' and data.replace(HEARTBEAT, b''))
+            break
+
+        # How long the message took to arrive once we were waiting for it
+        now = time.monotonic()
+        report['waits'].append(now - ready)
+        ready = now
+        report['received'] += 1
+        report['bytes_received'] += len(received)
+        if received != expected:
+            report['mismatches'] += 1
+
+    report['seconds'] = time.monotonic() - start
+    messages = report['sent'] + report['received']
+    report['messages_per_second'] = messages / report['seconds'] if report['seconds'] > 0 else float('inf')
+    return report
+
+
+def formatReport(report: dict) -> str:
+    """Formats a replay report for printing
+
+    Args:
+        report: the report returned by replay
+
+    Returns:
+        The report as lines of text
+    """
+    waits = sorted(report['waits'])
+    result = "Messages sent: {0} ({1} bytes)\n".format(report['sent'], report['bytes_sent'])
+    result += "Messages received: {0} ({1} bytes)\n".format(report['received'], report['bytes_received'])
+    result += "Seconds: {0:.3f}\n".format(report['seconds'])
+    result += "Messages per second: {0:.1f}\n".format(report['messages_per_second'])
+    if waits:
+        result += "Wait per received message (ms): p50 {0:.3f}, p95 {1:.3f}, max {2:.3f}\n".format(
+            waits[len(waits) // 2] * 1000, waits[int(len(waits) * 0.95)] * 1000, waits[-1] * 1000)
+    result += "Received messages that differ from the capture: {0}\n".format(report['mismatches'])
+    if report['stopped'] is not None:
+        result += "Stopped early: {0}\n".format(report['stopped'])
+    return result
+
+
+def main() -> None:
+    """The main function
+
+    Replays a capture against a peer, connecting to it or waiting for it
+    to connect, and prints the report
+
+    """
+    parser = argparse.ArgumentParser(description="Replay a recorded session against a live peer")
+    parser.add_argument('capture', help="the capture file, recorded with TTT_CAPTURE set")
+    side = parser.add_mutually_exclusive_group(required=True)
+    side.add_argument('--connect', metavar='HOST:PORT', help="connect to the peer, e.g. to replay player 1")
+    side.add_argument('--listen', metavar='HOST:PORT', help="wait for the peer to connect, e.g. to replay player 2")
+    parser.add_argument('--speed', type=float, default=1.0, help="how many times faster than recorded, 0 for as fast as possible")
+    parser.add_argument('--timeout', type=float, default=10.0, help="how many seconds to wait for the peer before giving up")
+    args = parser.parse_args()
+
+    role, events = loadCapture(args.capture)
+    host, port = (args.connect or args.listen).rsplit(':', 1)
+    if args.connect:
+        sock = socket.create_connection((host, int(port)))
+    else:
+        server_socket = socket.create_server((host, int(port)))
+        sock = server_socket.accept()[0]
+        server_socket.close()
+    # Send every message at once so the replay itself adds no latency
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    try:
+        print("Replaying " + role)
+        print(formatReport(replay(events, sock, args.speed, args.timeout)), end='')
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
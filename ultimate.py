@@ -0,0 +1,177 @@
+from gameboard import BoardClass, WIN_MASKS, FULL_MASK
+
+# Whether a 9 bit mask of blocks contains a row, column or diagonal
+WINNING = [any(mask & line == line for line in WIN_MASKS) for mask in range(512)]
+
+
+class UltimateBoardClass(BoardClass):
+    """The ultimate tic-tac-toe board
+
+    Every block of the board is a small board of its own. Winning a small
+    board takes its block on the big board, and the big board is won by the
+    usual rules, so x_mask and o_mask hold the big board and isWinner is
+    inherited. The block a move is made on decides which small board the
+    next move must be made on, unless that small board is already decided.
+
+    A move's index is (small board, block), both numbered 0 to 8 the same
+    way as the bits of a mask, so a move is still two ascii digits on the
+    wire.
+
+    Attributes:
+        x_cells: the blocks taken by 'x', 9 bits per small board, small board 0 first
+        o_cells: the blocks taken by 'o', laid out like x_cells
+        drawn_mask: the small boards that are full without a winner
+        forced: the small board the next move must be made on, or -1 for any
+    """
+    GRID_SIZE = 9
+
+    __slots__ = ('x_cells', 'o_cells', 'drawn_mask', 'forced')
+
+    def resetAll(self) -> None:
+        """Resets the names, the scores and the board"""
+        super().resetAll()
+        self.resetGameBoard()
+
+    def resetGameBoard(self) -> None:
+        """Resets the game board
+
+        Clears every small board and the big board
+
+        """
+        super().resetGameBoard()
+        self.x_cells = 0
+        self.o_cells = 0
+        self.drawn_mask = 0
+        self.forced = -1
+
+    def updateGameBoard(self, index: tuple, move: str, player_name: str) -> None:
+        """Updates the game board
+
+        Updates the small board the move was made on, and the big board if
+        the move decided the small board. Works out where the next move
+        must be made.
+
+        Args:
+            index: the small board and the block of the move
+            move: the move that was made, either 'x' or 'o'
+            player_name: the name of the player that made the move
+
+        """
+        small_board, block = index
+        shift = small_board * 9
+        if move == 'x':
+            self.x_cells |= 1 << (shift + block)
+            taken = self.x_cells >> shift & FULL_MASK
+        else:
+            self.o_cells |= 1 << (shift + block)
+            taken = self.o_cells >> shift & FULL_MASK
+
+        if WINNING[taken]:
+            if move == 'x':
+                self.x_mask |= 1 << small_board
+            else:
+                self.o_mask |= 1 << small_board
+        elif (self.x_cells | self.o_cells) >> shift & FULL_MASK == FULL_MASK:
+            self.drawn_mask |= 1 << small_board
+
+        # The next move goes to the small board matching the block, if it is still open
+        if (self.x_mask | self.o_mask | self.drawn_mask) >> block & 1:
+            self.forced = -1
+        else:
+            self.forced = block
+        self.name_of_last_player = player_name
+
+    def isValidMove(self, index: tuple) -> bool:
+        """Checks if a move can be made at index
+
+        A move is valid when its small board is still open and is the one
+        the last move sent it to, if any, and its block is empty
+
+        Args:
+            index: the small board and the block of the move
+
+        Returns:
+            A bool value indicating if the move is valid
+
+        """
+        small_board, block = index
+        if not (0 <= small_board < 9 and 0 <= block < 9):
+            return False
+        if self.forced != -1 and small_board != self.forced:
+            return False
+        if (self.x_mask | self.o_mask | self.drawn_mask) >> small_board & 1:
+            return False
+        return not (self.x_cells | self.o_cells) >> (small_board * 9 + block) & 1
+
+    def legalMoves(self) -> list[tuple]:
+        """Get every move that can be made
+
+        Returns:
+            The index of every move that is valid
+        """
+        if self.forced != -1:
+            small_boards = [self.forced]
+        else:
+            open_boards = ~(self.x_mask | self.o_mask | self.drawn_mask) & FULL_MASK
+            small_boards = [small_board for small_board in range(9) if open_boards >> small_board & 1]
+
+        moves = []
+        taken = self.x_cells | self.o_cells
+        for small_board in small_boards:
+            free = ~(taken >> (small_board * 9)) & FULL_MASK
+            moves += [(small_board, block) for block in range(9) if free >> block & 1]
+        return moves
+
+    def boardIsFull(self) -> bool:
+        """Checks if the board is full
+
+        The board is full when every small board is won or drawn. Update
+        the tie count if the board is full
+
+        Returns:
+            A bool value that indicates if the board is full
+        """
+        if self.x_mask | self.o_mask | self.drawn_mask != FULL_MASK:
+            return False
+        self.result = 'Tie'
+        self.number_of_ties += 1
+        return True
+
+    def indexOfCell(self, x: int, y: int) -> tuple:
+        """Get the index of a move from the block clicked on screen
+
+        Args:
+            x: the column of the block on screen, 0 to 8
+            y: the row of the block on screen, 0 to 8
+
+        Returns:
+            The small board and the block of the move
+        """
+        return ((x // 3) * 3 + y // 3, (x % 3) * 3 + y % 3)
+
+    def cellOfIndex(self, index: tuple) -> tuple[int, int]:
+        """Get the block on screen a move is drawn on
+
+        Args:
+            index: the small board and the block of the move
+
+        Returns:
+            The column and row of the block on screen
+        """
+        small_board, block = index
+        return ((small_board // 3) * 3 + block // 3, (small_board % 3) * 3 + block % 3)
+
+    def getPositionCode(self) -> int:
+        """Get a number that identifies the position on every small board
+
+        Reads the small boards in order as one base 3 number where an
+        empty block is 0, 'x' is 1 and 'o' is 2
+
+        Returns:
+            The code of the position, between 0 and 3**81 - 1
+
+        """
+        code = 0
+        for bit in range(81):
+            code = code * 3 + (self.x_cells >> bit & 1) + 2 * (self.o_cells >> bit & 1)
+        return code